@@ -0,0 +1,225 @@
+'''
+Byte-level statistics over many item records, for working out what the
+unknown parts of the item structure mean.
+
+Records from every snapshot are stacked into one flat buffer, so that the
+bytes at a given offset of every record are just a strided slice of it. The
+per-offset statistics are then computed with bytes/int operations that run in
+C, rather than looping over every byte of every record in Python.
+'''
+from __future__ import annotations
+
+import csv
+import math
+import operator
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from memory import Effect, Inventory, Item
+
+RECORD = Item.STRUCT_SIZE
+
+# (start, end, name) of everything in the item structure we know about.
+KNOWN_FIELDS: List[Tuple[int, int, str]] = [
+    (0x00, 0x08, 'item_id'),
+    (0x08, 0x0A, 'amount'),
+    (0x0A, 0x0C, 'level'),
+    (0x0C, 0x0D, 'rarity'),
+    (0x10, 0x14, 'status'),
+    (0x14, 0x1C, 'slot_pos'),
+    (0xE8, 0xEC, 'attack'),
+    (0xEC, 0xF0, 'defense'),
+    (0xF0, 0xF4, 'magic'),
+    (0xF4, 0xF8, 'resist'),
+    (0x110, 0x119, 'job1'),
+    (0x11C, 0x125, 'job2'),
+    (0x128, 0x138, 'skills'),
+    (0x13A, 0x13C, 'original_level'),
+    (0x13C, 0x144, 'summon'),
+]
+for _i in range(Effect.COUNT):
+    _start = Effect.FIRST + _i * Effect.SIZE
+    KNOWN_FIELDS += [
+        (_start + 0x00, _start + 0x04, f'effect{_i}.effect_id'),
+        (_start + 0x04, _start + 0x08, f'effect{_i}.raw_amount'),
+        (_start + 0x08, _start + 0x0C, f'effect{_i}.unknown1'),
+        (_start + 0x0C, _start + 0x0D, f'effect{_i}.affinity_level'),
+        (_start + 0x0D, _start + 0x0E, f'effect{_i}.affinity_type'),
+        (_start + 0x0E, _start + 0x18, f'effect{_i}.unknown2'),
+    ]
+
+
+def field_name(offset: int) -> str:
+    for start, end, name in KNOWN_FIELDS:
+        if start <= offset < end:
+            return f'{name}+{offset - start}' if end - start > 1 else name
+    return ''
+
+
+class RecordMatrix:
+    '''N item records of RECORD bytes each, stored back to back.'''
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data[:len(data) - len(data) % RECORD]
+        self.rows = len(self.data) // RECORD
+
+    @classmethod
+    def stack(cls, matrices: Iterable[RecordMatrix]) -> RecordMatrix:
+        return cls(b''.join(m.data for m in matrices))
+
+    @classmethod
+    def from_snapshot(cls, filename: Path) -> RecordMatrix:
+        with filename.open('rb') as f:
+            buffer = f.read()
+        _, count = struct.unpack_from('<II', buffer, 0)
+        return cls(buffer[8:8 + count * RECORD])
+
+    @classmethod
+    def from_inventory(cls, inventory: Inventory) -> RecordMatrix:
+        return cls(b''.join(item._buffer for item in inventory.items))
+
+    def column(self, offset: int) -> bytes:
+        '''The byte at `offset` of every record.'''
+        return self.data[offset::RECORD]
+
+    def field(self, offset: int, size: int) -> List[int]:
+        '''An unsigned little-endian field of every record.'''
+        values = list(self.column(offset))
+        for i in range(1, size):
+            high = self.column(offset + i)
+            values = list(map(operator.add, values,
+                              map(operator.mul, high,
+                                  [256 ** i] * self.rows)))
+        return values
+
+    def keys(self) -> List[bytes]:
+        '''Something to match up the same item across snapshots.'''
+        return [self.data[i:i + 8] + self.data[i + 0x14:i + 0x1C]
+                for i in range(0, len(self.data), RECORD)]
+
+    def select(self, rows: Sequence[int]) -> RecordMatrix:
+        return RecordMatrix(b''.join(
+            self.data[i * RECORD:(i + 1) * RECORD] for i in rows))
+
+
+def entropy(counts: Counter) -> float:
+    '''Shannon entropy, in bits, of a column's byte value counts.'''
+    total = sum(counts.values())
+    return sum(count / total * math.log2(total / count)
+               for count in counts.values())
+
+
+@dataclass
+class Series:
+    '''A column of values along with the sums a correlation needs.'''
+    values: Sequence[int]
+    n: int
+    total: int
+    squares: int
+
+    @classmethod
+    def from_values(cls, values: Sequence[int]) -> Series:
+        return cls(values, len(values), sum(values),
+                   sum(map(operator.mul, values, values)))
+
+    @classmethod
+    def from_column(cls, column: bytes, counts: Counter) -> Series:
+        # A column only holds byte values, so its sums come straight out of
+        # the value counts.
+        return cls(column, len(column),
+                   sum(value * count for value, count in counts.items()),
+                   sum(value * value * count
+                       for value, count in counts.items()))
+
+
+def correlation(x: Series, y: Series) -> Optional[float]:
+    '''Pearson correlation, or None if either side is constant.'''
+    n = x.n
+    var_x = n * x.squares - x.total * x.total
+    var_y = n * y.squares - y.total * y.total
+    if var_x <= 0 or var_y <= 0:
+        return None
+    products = sum(map(operator.mul, x.values, y.values))
+    return (n * products - x.total * y.total) / math.sqrt(var_x * var_y)
+
+
+def align(a: RecordMatrix, b: RecordMatrix) -> Tuple[RecordMatrix, RecordMatrix]:
+    '''Only the records that appear (exactly once) in both, in the same order.'''
+    a_keys, b_keys = a.keys(), b.keys()
+    a_counts, b_counts = Counter(a_keys), Counter(b_keys)
+    b_index = {key: i for i, key in enumerate(b_keys) if b_counts[key] == 1}
+    pairs = [(i, b_index[key]) for i, key in enumerate(a_keys)
+             if a_counts[key] == 1 and key in b_index]
+    return (a.select([i for i, _ in pairs]), b.select([j for _, j in pairs]))
+
+
+def change_counts(a: RecordMatrix, b: RecordMatrix) -> List[int]:
+    '''For every offset, how many aligned records differ at that byte.'''
+    # XOR the two matrices in one go; unchanged bytes come out as zero.
+    size = len(a.data)
+    xor = (int.from_bytes(a.data, 'little')
+           ^ int.from_bytes(b.data, 'little')).to_bytes(size, 'little')
+    return [a.rows - xor[offset::RECORD].count(0) for offset in range(RECORD)]
+
+
+@dataclass
+class OffsetStats:
+    offset: int
+    entropy: float
+    change_frequency: Optional[float]
+    correlations: Dict[str, Optional[float]]
+
+
+# Fields that the unknown bytes are compared against: (offset, size).
+CORRELATED_FIELDS: Dict[str, Tuple[int, int]] = {
+    'level': (0x0A, 2),
+    'rarity': (0x0C, 1),
+    'affinity': (0x114, 4),
+    'effect_affinity': (Effect.FIRST + 0x0C, 1),
+}
+
+
+def analyze(snapshots: Sequence[RecordMatrix]) -> List[OffsetStats]:
+    stacked = RecordMatrix.stack(snapshots)
+
+    changed = [0] * RECORD
+    compared = 0
+    for a, b in zip(snapshots, snapshots[1:]):
+        a, b = align(a, b)
+        changed = list(map(operator.add, changed, change_counts(a, b)))
+        compared += a.rows
+
+    fields = {name: Series.from_values(stacked.field(offset, size))
+              for name, (offset, size) in CORRELATED_FIELDS.items()}
+
+    results = []
+    for offset in range(RECORD):
+        column = stacked.column(offset)
+        counts = Counter(column)
+        series = Series.from_column(column, counts)
+        results.append(OffsetStats(
+            offset,
+            entropy(counts) if counts else 0.0,
+            changed[offset] / compared if compared else None,
+            {name: correlation(series, values)
+             for name, values in fields.items()},
+        ))
+    return results
+
+
+def to_csv(results: Sequence[OffsetStats], filename: Path) -> None:
+    with filename.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['offset', 'field', 'entropy', 'change_frequency'] +
+                        [f'corr_{name}' for name in CORRELATED_FIELDS])
+        for stats in results:
+            writer.writerow(
+                [f'0x{stats.offset:03X}', field_name(stats.offset),
+                 f'{stats.entropy:.3f}',
+                 '' if stats.change_frequency is None
+                 else f'{stats.change_frequency:.4f}'] +
+                ['' if value is None else f'{value:.3f}'
+                 for value in stats.correlations.values()])
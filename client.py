@@ -0,0 +1,50 @@
+'''
+Minimal client for `sop.py serve`.
+
+This deliberately only imports the standard library and config.py, so that
+it starts quickly enough to be bound to a hotkey:
+
+    python client.py filter
+    python client.py clear_markers '{"marker": 8}'
+    python client.py query '{"effect": "Strength"}'
+'''
+import itertools
+import json
+import socket
+import sys
+from typing import Any, Optional
+
+from config import Config
+
+_ids = itertools.count(1)
+
+
+class RemoteError(Exception):
+    pass
+
+
+def call(method: str, params: Optional[Any] = None,
+         host: Optional[str] = None, port: Optional[int] = None) -> Any:
+    host = host or Config.get('Server', 'Host', fallback='127.0.0.1')
+    port = port or Config.getint('Server', 'Port', fallback=47800)
+
+    request = {'jsonrpc': '2.0', 'id': next(_ids), 'method': method}
+    if params is not None:
+        request['params'] = params
+
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            response = json.loads(f.readline())
+
+    if 'error' in response:
+        raise RemoteError(response['error']['message'])
+    return response['result']
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f'usage: {sys.argv[0]} METHOD [PARAMS_JSON]')
+        sys.exit(1)
+    params = json.loads(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(json.dumps(call(sys.argv[1], params), indent=2))
@@ -0,0 +1,95 @@
+'''
+Picks a small set of items that between them still have every skill, and
+every effect at a level that config.ini's [Effects] section would keep.
+
+Each item's capabilities are an integer bitset, with one bit per requirement.
+The set is chosen greedily: always take the item that covers the most
+requirements that aren't covered yet. Gains only ever shrink as items are
+picked, so they're kept in a heap and only recomputed when they reach the top.
+'''
+from __future__ import annotations
+
+import heapq
+from typing import TYPE_CHECKING, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from database import ItemsDB
+from rules import Rules
+
+if TYPE_CHECKING:
+    from memory import Item
+
+
+def popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+def requirements(item: Item, rules: Rules) -> List[Hashable]:
+    '''Everything this item could be kept for.'''
+    db_entry = ItemsDB.get(item.item_id)
+    if db_entry is None or not db_entry.slots:
+        return []
+
+    result: List[Hashable] = []
+    for skill in item.skills:
+        if skill == 0:
+            continue
+        if 'Weapon' in db_entry.slots and rules.keep_weapon_skills:
+            result.append(('weapon skill', skill))
+        elif 'Accessory' in db_entry.slots and rules.keep_accessory_skills:
+            result.append(('accessory skill', skill))
+
+    for effect in item.effects:
+        if rules.effect_threshold(effect.name) < effect.affinity_level:
+            result.append(('effect', effect.effect_id))
+    return result
+
+
+def encode(items: Sequence[Item],
+           rules: Rules) -> Tuple[List[int], Dict[Hashable, int]]:
+    '''A bitset for every item, and the bit assigned to each requirement.'''
+    bits: Dict[Hashable, int] = {}
+    masks = []
+    for item in items:
+        mask = 0
+        for requirement in requirements(item, rules):
+            bit = bits.setdefault(requirement, len(bits))
+            mask |= 1 << bit
+        masks.append(mask)
+    return masks, bits
+
+
+def minimal_cover(items: Sequence[Item],
+                  rules: Optional[Rules] = None,
+                  kept: Sequence[Item] = ()) -> List[Item]:
+    '''
+    Items to add to `kept` (which are being kept anyway) so that every
+    requirement is covered. Only the added items are returned.
+    '''
+    if rules is None:
+        rules = Rules.default()
+
+    masks, bits = encode(items, rules)
+    universe = (1 << len(bits)) - 1
+
+    kept_ids = set(map(id, kept))
+    covered = 0
+    for item, mask in zip(items, masks):
+        if id(item) in kept_ids:
+            covered |= mask
+
+    # Ties go to the higher level item, then to whichever came first.
+    heap = [(-popcount(mask & ~covered), -items[i].level, i)
+            for i, mask in enumerate(masks)
+            if mask & ~covered and id(items[i]) not in kept_ids]
+    heapq.heapify(heap)
+
+    chosen = []
+    while heap and covered != universe:
+        neg_gain, neg_level, i = heapq.heappop(heap)
+        gain = popcount(masks[i] & ~covered)
+        if gain == -neg_gain:
+            chosen.append(items[i])
+            covered |= masks[i]
+        elif gain > 0:
+            heapq.heappush(heap, (-gain, neg_level, i))
+    return chosen
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import csv
 import struct
+import sys
 import textwrap
 from dataclasses import dataclass, asdict, field
 from typing import (cast, ClassVar, Dict, Generator, Tuple, List, TypeVar,
@@ -10,6 +11,7 @@ from pathlib import Path
 from pprint import pprint, pformat
 
 from config import Config
+from patch import LayoutError, backup, patch_entries, patch_records
 
 INSTALL_DIR = Path(Config['General']['Install Directory'])
 
@@ -132,14 +134,22 @@ class ItemDBEntry(DBEntry):
 
     @property
     def name(self) -> str:
-        return Strings.get(self.string_id)
+        name = Lookup.item_names.get(self.id)
+        return name if name is not None else Strings.get(self.string_id)
 
     @property
     def type(self) -> str:
+        item_type = Lookup.item_types.get(self.id)
+        if item_type is not None:
+            return item_type
         return ITEM_TYPES.get(self.item_type, '(unknown)')
 
     @property
     def slots(self) -> str:
+        slots = Lookup.item_slots.get(self.id)
+        return slots if slots is not None else self.resolve_slots()
+
+    def resolve_slots(self) -> str:
         if self.type == 'Body':
             if self.slot_type == 0:
                 return '1-Slot Armour'
@@ -197,10 +207,15 @@ class EffectDBEntry(DBEntry):
 
     @property
     def name(self) -> str:
-        return Strings.get(self.string_ids[0])
+        name = Lookup.effect_names.get(self.id)
+        return name if name is not None else Strings.get(self.string_ids[0])
 
     @property
     def string(self) -> str:
+        string = Lookup.effect_strings.get(self.id)
+        return string if string is not None else self.resolve_string()
+
+    def resolve_string(self) -> str:
         return ''.join(
             Strings.get(s) for s in (self.string_ids[0], self.string_ids[3]))
 
@@ -383,6 +398,7 @@ class Database(Generic[DBEntryType]):
             self.entries[entry.id] = entry
             index += size
 
+        Lookup.index(self)
         return self
         
     def save(self, filename: Path) -> None:
@@ -391,6 +407,23 @@ class Database(Generic[DBEntryType]):
             for entry in self.entries.values():
                 f.write(entry.to_bytes())
 
+    def patch(self, filename: Path) -> int:
+        '''
+        Like save, but only rewrites the entries that changed. Falls back to
+        saving the whole file if entries were added or removed. Raises
+        VerificationError if the patched file didn't come out right.
+        '''
+        header = struct.pack('<II', 537141760, len(self.entries))
+        entries = [entry.to_bytes() for entry in self.entries.values()]
+        try:
+            return patch_entries(filename, header, entries,
+                                 self.entry_type.SIZE)
+        except (LayoutError, FileNotFoundError):
+            if filename.exists():
+                backup(filename)
+            self.save(filename)
+            return len(entries)
+
     def to_csv(self, filename: str) -> None:
         with open(filename, 'w', encoding='utf-8', newline='') as f:
             csv_w = csv.writer(f)
@@ -468,10 +501,22 @@ class Strings:
         
     def save_file(self, filename: Path) -> None:
         with filename.open('wb') as f:
-            for string_id, string in self.strings.items():
-                length = len(string) + 1
-                f.write(struct.pack(f'<II{length*2}s',
-                    string_id, length, (string+'\0').encode('utf-16le')))
+            f.write(b''.join(self.records()))
+
+    def patch_file(self, filename: Path) -> int:
+        '''Like save_file, but only rewrites from the first changed string.'''
+        if not filename.exists():
+            self.save_file(filename)
+            return filename.stat().st_size
+        return patch_records(filename, self.records())
+
+    def records(self) -> List[bytes]:
+        records = []
+        for string_id, string in self.strings.items():
+            length = len(string) + 1
+            records.append(struct.pack(f'<II{length*2}s',
+                string_id, length, (string+'\0').encode('utf-16le')))
+        return records
 
     @classmethod
     def get(cls, string_id: int) -> str:
@@ -484,6 +529,47 @@ class Strings:
         raise Exception(f'String ID {string_id} not found.')
 
 
+class Lookup:
+    '''
+    Names, types and slot categories for every item and effect, worked out
+    once when their database is loaded. The properties above read from these
+    tables, so the filter doesn't redo the string lookups for every item.
+    '''
+    item_names: ClassVar[Dict[int, str]] = {}
+    item_types: ClassVar[Dict[int, str]] = {}
+    item_slots: ClassVar[Dict[int, str]] = {}
+    effect_names: ClassVar[Dict[int, str]] = {}
+    effect_strings: ClassVar[Dict[int, str]] = {}
+
+    @classmethod
+    def index(cls, db: Database) -> None:
+        # An entry whose strings can't be found is left out, so that it only
+        # fails if something actually looks it up (through the DBEntry
+        # properties, which resolve anything missing here themselves).
+        if db.entry_type is ItemDBEntry:
+            names, types, slots = {}, {}, {}
+            for entry in db.entries.values():
+                types[entry.id] = ITEM_TYPES.get(entry.item_type, '(unknown)')
+                slots[entry.id] = sys.intern(entry.resolve_slots())
+                try:
+                    names[entry.id] = sys.intern(Strings.get(entry.string_id))
+                except Exception:
+                    continue
+            cls.item_names, cls.item_types, cls.item_slots = (names, types,
+                                                              slots)
+        elif db.entry_type is EffectDBEntry:
+            names, strings = {}, {}
+            for entry in db.entries.values():
+                try:
+                    name = Strings.get(entry.string_ids[0])
+                    string = entry.resolve_string()
+                except Exception:
+                    continue
+                names[entry.id] = sys.intern(name)
+                strings[entry.id] = sys.intern(string)
+            cls.effect_names, cls.effect_strings = names, strings
+
+
 Strings.load_language('eng')
 ItemsDB = Database(ItemDBEntry).load()
 EffectsDB = Database(EffectDBEntry).load()
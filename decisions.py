@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from database import ItemsDB, EffectsDB
+from rules import Rules
+
+if TYPE_CHECKING:
+    from memory import Item
+
+# Bytes 0x10-0x14 hold the item status, which the filter itself changes.
+STATUS_START = 0x10
+STATUS_END = 0x14
+
+
+class DecisionCache:
+    '''
+    Remembers the result of Item.should_keep between runs.
+
+    Decisions are keyed by a hash of the item's record (minus its status)
+    and a hash of only the rules that can affect that item: the thresholds
+    for its effects, and the artifact/affinity rules for its slot category.
+    Changing one line of config.ini only invalidates the items that line
+    applies to, and only new or changed items need to be evaluated.
+    '''
+
+    def __init__(self, path: Optional[Path] = None,
+                 decisions: Optional[Dict[str, bool]] = None) -> None:
+        self.path = path
+        self.decisions: Dict[str, bool] = decisions or {}
+        self.used: Dict[str, bool] = {}
+        self.reused = 0
+        self.evaluated = 0
+        self._rules: Optional[Rules] = None
+        self._rule_digests: Dict[Tuple[int, Tuple[int, ...]], str] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> DecisionCache:
+        try:
+            with path.open('r') as f:
+                decisions = json.load(f)
+        except (FileNotFoundError, ValueError):
+            decisions = {}
+        return cls(path, decisions)
+
+    def save(self, path: Optional[Path] = None) -> None:
+        path = path or self.path
+        if path is None:
+            return
+        # Only keep decisions for items that still exist.
+        with path.open('w') as f:
+            json.dump(self.used, f)
+
+    @staticmethod
+    def record_digest(item: Item) -> str:
+        buffer = item._buffer
+        h = hashlib.blake2b(digest_size=16)
+        h.update(buffer[:STATUS_START])
+        h.update(buffer[STATUS_END:])
+        return h.hexdigest()
+
+    def rule_digest(self, item: Item, rules: Rules) -> str:
+        if rules is not self._rules:
+            self._rules = rules
+            self._rule_digests.clear()
+
+        effect_ids = tuple(effect.effect_id for effect in item.effects)
+        key = (item.item_id, effect_ids)
+        digest = self._rule_digests.get(key)
+        if digest is None:
+            db_entry = ItemsDB.get(item.item_id)
+            slot_type = db_entry.slots if db_entry else ''
+            applicable = (
+                slot_type,
+                rules.keep_artifacts(slot_type),
+                rules.minimum_affinity(slot_type),
+                [(effect_id,
+                  rules.effect_threshold(EffectsDB[effect_id].string))
+                 for effect_id in effect_ids],
+            )
+            digest = hashlib.blake2b(repr(applicable).encode('utf-8'),
+                                     digest_size=16).hexdigest()
+            self._rule_digests[key] = digest
+        return digest
+
+    def should_keep(self, item: Item, rules: Rules) -> bool:
+        key = self.record_digest(item) + self.rule_digest(item, rules)
+        keep = self.decisions.get(key)
+        if keep is None:
+            keep = item.should_keep(rules)
+            self.decisions[key] = keep
+            self.evaluated += 1
+        else:
+            self.reused += 1
+        self.used[key] = keep
+        return keep
+
+    def reset_counts(self) -> None:
+        self.used = {}
+        self.reused = 0
+        self.evaluated = 0
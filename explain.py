@@ -0,0 +1,80 @@
+'''
+Which rule kept each item, and how much each rule costs.
+
+Pass an Explanation to Inventory.filter (or Item.should_keep) to fill it in.
+Without one, the filter only pays for an `is not None` check per rule.
+'''
+from __future__ import annotations
+
+import csv
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from rules import Rules, SLOT_CATEGORIES
+
+if TYPE_CHECKING:
+    from memory import Item
+
+# The config.ini section behind each rule, in the order the filter checks
+# them.
+SECTIONS: Dict[str, str] = {
+    'effect': 'Effects',
+    'artifact': 'Keep Artifacts',
+    'blessed': 'Keep Artifacts',
+    'affinity': 'Minimum Affinity',
+    'skill': 'Skills',
+    'best': 'Best Per Effect',
+}
+
+
+@dataclass
+class RuleStats:
+    evaluated: int = 0
+    hits: int = 0
+    seconds: float = 0.0
+
+
+class Explanation:
+    def __init__(self) -> None:
+        self.rules: Dict[str, RuleStats] = {rule: RuleStats()
+                                            for rule in SECTIONS}
+        # (section, key) -> number of items kept because of that line.
+        self.lines: Counter = Counter()
+        # (item, rule, key) for every kept item.
+        self.kept: List[Tuple[Item, str, str]] = []
+
+    @staticmethod
+    def start() -> float:
+        return time.perf_counter()
+
+    def evaluated(self, rule: str, start: float) -> None:
+        '''Counts one check of a rule, which began at `start`.'''
+        stats = self.rules[rule]
+        stats.evaluated += 1
+        stats.seconds += time.perf_counter() - start
+
+    def hit(self, rule: str, item: Item, key: str) -> None:
+        '''Records that `item` was kept by the `key` line of a rule.'''
+        self.rules[rule].hits += 1
+        self.lines[SECTIONS[rule], key.lower()] += 1
+        self.kept.append((item, rule, key))
+
+    def unused_lines(self, rules: Rules) -> List[Tuple[str, str]]:
+        '''Config lines that are set up to keep items, but didn't keep any.'''
+        lines = [('Effects', name) for name in rules.effects]
+        lines += [('Keep Artifacts', slot.lower()) for slot in SLOT_CATEGORIES
+                  if rules.keep_artifacts(slot)]
+        lines += [('Minimum Affinity', slot.lower())
+                  for slot in SLOT_CATEGORIES if slot.lower() in rules.min_affinity]
+        return [line for line in lines if not self.lines[line]]
+
+    def to_csv(self, filename: Path) -> None:
+        with filename.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['item', 'level', 'rule', 'section', 'line'])
+            for item, rule, key in self.kept:
+                writer.writerow([item.name, item.level, rule, SECTIONS[rule],
+                                 key])
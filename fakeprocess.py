@@ -0,0 +1,207 @@
+'''
+A stand-in for pymem.Pymem that keeps "process memory" in local buffers.
+
+It supports the subset of pymem that this tool uses, and can simulate the
+latency of each cross-process call, which makes it useful for trying out the
+memory readers without the game running:
+
+    python fakeprocess.py
+
+HelperProcess goes a step further for process.LinuxProcess: it starts a real
+process with a file named like the game's module mapped into its memory, so
+the same regions can be found and accessed through /proc.
+'''
+from __future__ import annotations
+
+import mmap
+import re
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class FakeProcess:
+    def __init__(self,
+                 regions: Dict[int, Union[bytes, bytearray]],
+                 base_address: int = 0x140000000,
+                 read_latency: float = 0.0,
+                 write_latency: float = 0.0) -> None:
+        '''
+        regions maps offsets from base_address to the memory found there.
+        read_latency and write_latency are the number of seconds each read
+        and write call takes.
+        '''
+        self.base_address = base_address
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.regions: Dict[int, bytearray] = {
+            base_address + offset: bytearray(data)
+            for offset, data in regions.items()
+        }
+        self.reads = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def _locate(self, address: int, size: int) -> Tuple[bytearray, int]:
+        for start, data in self.regions.items():
+            if start <= address and address + size <= start + len(data):
+                return data, address - start
+        raise MemoryError(f'Could not access {size} bytes at {address:#x}')
+
+    def read_bytes(self, address: int, length: int) -> bytes:
+        # time.sleep releases the GIL, much like ReadProcessMemory does.
+        if self.read_latency:
+            time.sleep(self.read_latency)
+        with self._lock:
+            self.reads += 1
+            data, offset = self._locate(address, length)
+            return bytes(data[offset:offset + length])
+
+    def read_uint(self, address: int) -> int:
+        return struct.unpack('<I', self.read_bytes(address, 4))[0]
+
+    def write_bytes(self, address: int, value: bytes, length: int) -> None:
+        if self.write_latency:
+            time.sleep(self.write_latency)
+        with self._lock:
+            self.writes += 1
+            data, offset = self._locate(address, length)
+            data[offset:offset + length] = value[:length]
+
+    def write_uint(self, address: int, value: int) -> None:
+        self.write_bytes(address, struct.pack('<I', value), 4)
+
+    def pattern_scan_module(self, pattern: bytes, module: str,
+                            return_multiple: bool = False
+                            ) -> Union[Optional[int], List[int]]:
+        found = []
+        regex = re.compile(pattern, re.DOTALL)
+        for start, data in sorted(self.regions.items()):
+            found.extend(start + m.start() for m in regex.finditer(data))
+        if return_multiple:
+            return found
+        return found[0] if found else None
+
+
+def write_image(path: Path, regions: Dict[int, Union[bytes, bytearray]]) -> None:
+    '''
+    Writes a file laid out like the game's module in memory: a minimal PE
+    header giving the image size, then each region at its offset.
+    '''
+    size = max(offset + len(data) for offset, data in regions.items())
+    size = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE * mmap.PAGESIZE
+    header = bytearray(0x100)
+    header[0:2] = b'MZ'
+    struct.pack_into('<I', header, 0x3C, 0x80)
+    header[0x80:0x84] = b'PE\0\0'
+    struct.pack_into('<I', header, 0x80 + 24 + 56, size)
+    with path.open('wb') as f:
+        f.truncate(size)
+        f.write(header)
+        for offset, data in regions.items():
+            f.seek(offset)
+            f.write(data)
+
+
+class HelperProcess:
+    '''
+    A child process that maps an image written by write_image, privately so
+    that writes only change its own memory, and keeps it mapped until closed.
+    '''
+
+    def __init__(self,
+                 regions: Dict[int, Union[bytes, bytearray]],
+                 module: str = 'SOPFFO.exe') -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.image = Path(self._directory.name) / module
+        write_image(self.image, regions)
+        self._process = subprocess.Popen(
+            [sys.executable, __file__, '--helper', str(self.image)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        # Wait until the image is mapped.
+        self._process.stdout.readline()
+        self.pid = self._process.pid
+
+    def __enter__(self) -> HelperProcess:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._process.stdin.close()
+        self._process.wait()
+        self._directory.cleanup()
+
+
+def _run_helper(image: str) -> None:
+    with open(image, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    print('ready', flush=True)
+    # Stay alive until the parent closes stdin.
+    sys.stdin.read()
+    mapped.close()
+
+
+if __name__ == '__main__' and sys.argv[1:2] == ['--helper']:
+    _run_helper(sys.argv[2])
+elif __name__ == '__main__':
+    from reader import RegionReader
+
+    record_size = 0x148
+    sizes = {68785416: 600 * record_size, 69966560: 5500 * record_size}
+    process = FakeProcess({offset: bytes(size)
+                           for offset, size in sizes.items()},
+                          read_latency=0.002)
+    regions = [(process.base_address + offset, size)
+               for offset, size in sizes.items()]
+
+    for threads in (1, 2, 4, 8):
+        start = time.perf_counter()
+        with RegionReader(process, 64 * record_size, threads) as reader:
+            chunks = reader.read_all(regions)
+        elapsed = time.perf_counter() - start
+        print(f'{threads} thread(s): {len(chunks)} reads in {elapsed:.3f}s')
+
+    from scheduler import WriteScheduler
+
+    process.write_latency = 0.0002
+    statuses = [address + i * record_size + 0x10
+                for address, size in regions
+                for i in range(size // record_size)]
+    start = time.perf_counter()
+    with WriteScheduler(process) as scheduler:
+        for address in statuses:
+            scheduler.write_uint(address, 0)
+    elapsed = time.perf_counter() - start
+    print(f'{scheduler.written} paced writes in {scheduler.slices} slices of '
+          f'up to {scheduler.budget * 1000:g}ms each, {elapsed:.3f}s in total')
+
+    if sys.platform.startswith('linux'):
+        from process import IOV_MAX, LinuxProcess
+
+        with HelperProcess({offset: bytes(size)
+                            for offset, size in sizes.items()}) as helper:
+            linux = LinuxProcess(helper.pid)
+            regions = [(linux.base_address + offset, size)
+                       for offset, size in sizes.items()]
+            start = time.perf_counter()
+            with RegionReader(linux, 64 * record_size, 4) as reader:
+                chunks = reader.read_all(regions)
+            elapsed = time.perf_counter() - start
+            print(f'Helper process: {len(chunks)} reads in {elapsed:.3f}s')
+
+            statuses = [address + i * record_size + 0x10
+                        for address, size in regions
+                        for i in range(size // record_size)]
+            start = time.perf_counter()
+            linux.write_many([(address, bytes(4)) for address in statuses])
+            elapsed = time.perf_counter() - start
+            print(f'Helper process: {len(statuses)} writes in batches of '
+                  f'up to {IOV_MAX}, {elapsed:.3f}s')
+            linux.close()
@@ -0,0 +1,117 @@
+'''
+A journal of item statuses from before a command changed them, so that the
+change can be undone.
+
+The journal is a small binary file: a header with the game's base address,
+then (slot address, item_id, old status) for every slot the command touched.
+'''
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from memory import Item
+from process import read_many, write_many
+
+JOURNAL_PATH = Path('journal.bin')
+
+HEADER = struct.Struct('<4sIQ')
+ENTRY = struct.Struct('<QII')
+MAGIC = b'SOPJ'
+
+# Longest run of adjacent slots to check with a single read.
+MAX_RUN = 64
+
+STATUS_OFFSET = 0x10
+
+
+class JournalException(Exception):
+    pass
+
+
+class Journal:
+    def __init__(self, base_address: int) -> None:
+        self.base_address = base_address
+        # Slot address -> (item_id, status). Only the first status recorded
+        # for a slot is kept, since that's the one to go back to.
+        self.entries: Dict[int, Tuple[int, int]] = {}
+
+    @classmethod
+    def for_process(cls, process: Any) -> Journal:
+        return cls(process.base_address)
+
+    def record(self, item: Item) -> None:
+        self.entries.setdefault(item._address, (item.item_id, item.status))
+
+    def record_all(self, items: Iterable[Item]) -> Journal:
+        for item in items:
+            self.record(item)
+        return self
+
+    def save(self, path: Path = JOURNAL_PATH) -> None:
+        with path.open('wb') as f:
+            f.write(HEADER.pack(MAGIC, len(self.entries), self.base_address))
+            f.write(b''.join(ENTRY.pack(address, item_id, status)
+                             for address, (item_id, status)
+                             in self.entries.items()))
+
+    @classmethod
+    def load(cls, path: Path = JOURNAL_PATH) -> Journal:
+        with path.open('rb') as f:
+            data = f.read()
+        magic, count, base_address = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise JournalException(f'{path} is not a status journal.')
+        journal = cls(base_address)
+        for address, item_id, status in ENTRY.iter_unpack(
+                data[HEADER.size:HEADER.size + count * ENTRY.size]):
+            journal.entries[address] = (item_id, status)
+        return journal
+
+    def runs(self) -> List[List[int]]:
+        '''Journaled addresses, grouped into runs of adjacent slots.'''
+        runs: List[List[int]] = []
+        for address in sorted(self.entries):
+            if (runs and len(runs[-1]) < MAX_RUN
+                    and address - runs[-1][-1] == Item.STRUCT_SIZE):
+                runs[-1].append(address)
+            else:
+                runs.append([address])
+        return runs
+
+    def restore(self, process: Any) -> Tuple[int, int]:
+        '''
+        Puts the journaled statuses back. Each run of adjacent slots is read
+        as one block, with all of the blocks in one call when the process
+        supports it, but only the 4-byte statuses are written back, so that
+        nothing else the game changed in the meantime is undone. A slot is
+        only restored if it still holds the same item. Returns (restored,
+        skipped).
+        '''
+        if process.base_address != self.base_address:
+            raise JournalException(
+                'The game has been restarted since this journal was saved.')
+
+        runs = self.runs()
+        blocks = read_many(process, [
+            (run[0], run[-1] + Item.STRUCT_SIZE - run[0]) for run in runs])
+
+        restored = skipped = 0
+        writes = []
+        for run, block in zip(runs, blocks):
+            for address in run:
+                offset = address - run[0]
+                item_id, status = self.entries[address]
+                ids = struct.unpack_from('<II', block, offset)
+                if ids != (item_id, item_id):
+                    skipped += 1
+                    continue
+                current, = struct.unpack_from('<I', block,
+                                              offset + STATUS_OFFSET)
+                if current != status:
+                    writes.append((address + STATUS_OFFSET,
+                                   struct.pack('<I', status)))
+                restored += 1
+        write_many(process, writes)
+        return restored, skipped
@@ -6,13 +6,42 @@ import textwrap
 from collections import defaultdict
 from pathlib import Path
 from dataclasses import dataclass, asdict, field
-from typing import cast, ClassVar, Dict, Tuple, List, Optional
+from typing import cast, ClassVar, Dict, Generator, Tuple, List, Optional
 from pprint import pprint, pformat
 
 from config import Config
-from database import ItemsDB, EffectsDB, JobsDB
-
-import pymem
+from database import ItemsDB, EffectsDB, JobsDB, Lookup
+from coverage import minimal_cover
+from decisions import DecisionCache
+from explain import Explanation
+from process import Process, open_process
+from rules import Rules
+from reader import RegionReader, UnstableReadException, stabilize
+from selection import TopK
+
+# Where the game keeps items, as (offset from the module base, slot count):
+# the 600 inventory slots, then the 5500 storage slots.
+#
+# Addresses discovered with:
+# a = pm.pattern_scan_module(b'([^\\x00]...|.[^\\x00]..)\\1..[^\\x00][^\\x00]', 'SOPFFO.exe', return_multiple=True)
+# b = [(x, ItemsDB.get(pm.read_uint(x))) for x in a]
+# c = [x for x in b if x[1] and x[1].name]
+# inv = [Item.from_bytes(pm.read_bytes(x, Item.STRUCT_SIZE), address=x, process=pm) for x, _ in c]
+REGIONS: List[Tuple[int, int]] = [(68785416, 600), (69966560, 5500)]
+
+# Number of item slots to read from the game at once, and how many of those
+# reads to have in flight.
+CHUNK_SLOTS = Config.getint('Memory', 'Chunk Slots', fallback=64)
+READ_THREADS = Config.getint('Memory', 'Read Threads', fallback=4)
+
+# Whether to check every chunk against a second read, so that items the game
+# changes mid-read aren't half old and half new, and how many times to re-read
+# a chunk that keeps changing.
+CONSISTENT_READS = Config.getboolean('Memory', 'Consistent Reads',
+                                     fallback=False)
+READ_RETRIES = Config.getint('Memory', 'Read Retries', fallback=3)
+
+AFFINITY_COLORS: Dict[int, str] = {1: 'Evocation', 2: 'Ultima'}
 
 class InvalidItemException(Exception):
     pass
@@ -31,6 +60,8 @@ class Effect:
     FIRST: ClassVar[int] = 0x28
     SIZE: ClassVar[int] = 24
     COUNT: ClassVar[int] = 8
+    # effect_id, raw_amount and affinity_level, skipping everything else.
+    KEY_STRUCT: ClassVar[struct.Struct] = struct.Struct('<II4xB11x')
 
     @classmethod
     def from_bytes(cls, data: bytes) -> Effect:
@@ -46,8 +77,7 @@ class Effect:
     @classmethod
     def create_table(cls, conn):
         conn.executescript('''
-        DROP TABLE IF EXISTS effect_instances;
-        CREATE TABLE effect_instances (
+        CREATE TABLE IF NOT EXISTS effect_instances (
             id INTEGER PRIMARY KEY,
             effect_id INTEGER NOT NULL,
             owner_id INTEGER NOT NULL,
@@ -59,6 +89,10 @@ class Effect:
             FOREIGN KEY (effect_id) REFERENCES effects (id),
             FOREIGN KEY (owner_id) REFERENCES item_instances (id)
         );
+        CREATE INDEX IF NOT EXISTS effect_instances_owner
+            ON effect_instances (owner_id);
+        CREATE INDEX IF NOT EXISTS effect_instances_effect_level
+            ON effect_instances (effect_id, affinity_level, owner_id, amount);
         ''')
 
     def insert_row(self, conn, owner_id: int):
@@ -85,15 +119,12 @@ class Effect:
     def name(self) -> str:
         if self.effect_id == 0:
             return '(none)'
-        return EffectsDB[self.effect_id].string
+        string = Lookup.effect_strings.get(self.effect_id)
+        return string if string is not None else EffectsDB[self.effect_id].string
 
     @property
     def color(self) -> str:
-        if self.affinity_type == 1:
-            return 'Evocation'
-        if self.affinity_type == 2:
-            return 'Ultima'
-        return 'Chaos'
+        return AFFINITY_COLORS.get(self.affinity_type, 'Chaos')
 
     def __repr__(self) -> str:
         affinity = ''
@@ -104,7 +135,7 @@ class Effect:
 
 @dataclass
 class Item:
-    _process: Optional[pymem.Pymem]
+    _process: Optional[Process]
     _address: int
     _buffer: bytes
 
@@ -134,7 +165,7 @@ class Item:
     STRUCT_SIZE: ClassVar[int] = 0x148
 
     @classmethod
-    def from_process(cls, process: pymem.Pymem, address: int) -> Item:
+    def from_process(cls, process: Process, address: int) -> Item:
         data = process.read_bytes(address, Item.STRUCT_SIZE)
         return cls.from_bytes(data, address=address, process=process)
 
@@ -142,7 +173,7 @@ class Item:
     def from_bytes(cls,
                    data: bytes,
                    address: int = 0,
-                   process: Optional[pymem.Pymem] = None) -> Item:
+                   process: Optional[Process] = None) -> Item:
         id = struct.unpack_from('<II', data, 0x00)
         if id[0] != id[1]:
             raise InvalidItemException('Item IDs do not match')
@@ -190,10 +221,27 @@ class Item:
 
     @classmethod
     def create_table(cls, conn):
+        # Snapshots used to replace each other. If sop.db is from before
+        # snapshots were kept, start the instance tables over.
+        columns = [row[1] for row in conn.execute(
+            'PRAGMA table_info(item_instances)')]
+        if columns and 'snapshot_id' not in columns:
+            conn.executescript('''
+            DROP TABLE IF EXISTS item_instances;
+            DROP TABLE IF EXISTS item_skills;
+            DROP TABLE IF EXISTS item_jobs;
+            DROP TABLE IF EXISTS effect_instances;
+            ''')
+
         conn.executescript('''
-        DROP TABLE IF EXISTS item_instances;
-        CREATE TABLE item_instances (
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY,
+            taken_at TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS item_instances (
             id INTEGER PRIMARY KEY,
+            snapshot_id INTEGER NOT NULL,
             item_id INTEGER NOT NULL,
             amount INTEGER NOT NULL,
             level INTEGER NOT NULL,
@@ -204,19 +252,26 @@ class Item:
             slot_pos2 INTEGER NOT NULL,
             summon_id INTEGER NOT NULL,
             summon_level INTEGER NOT NULL,
+            FOREIGN KEY (snapshot_id) REFERENCES snapshots (id),
             FOREIGN KEY (item_id) REFERENCES items (id)
         );
+        CREATE INDEX IF NOT EXISTS item_instances_snapshot_item
+            ON item_instances (snapshot_id, item_id);
+        CREATE INDEX IF NOT EXISTS item_instances_item
+            ON item_instances (item_id);
         
-        DROP TABLE IF EXISTS item_skills;
-        CREATE TABLE item_skills (
+        CREATE TABLE IF NOT EXISTS item_skills (
             id INTEGER PRIMARY KEY,
             owner_id INTEGER NOT NULL,
             skill INTEGER NOT NULL,
             FOREIGN KEY (owner_id) REFERENCES item_instances (id)
         );
+        CREATE INDEX IF NOT EXISTS item_skills_owner
+            ON item_skills (owner_id, skill);
+        CREATE INDEX IF NOT EXISTS item_skills_skill
+            ON item_skills (skill, owner_id);
         
-        DROP TABLE IF EXISTS item_jobs;
-        CREATE TABLE item_jobs (
+        CREATE TABLE IF NOT EXISTS item_jobs (
             id INTEGER PRIMARY KEY,
             owner_id INTEGER NOT NULL,
             job_id INTEGER NOT NULL,
@@ -225,16 +280,20 @@ class Item:
             FOREIGN KEY (owner_id) REFERENCES item_instances (id),
             FOREIGN KEY (job_id) REFERENCES jobs (id)
         );
+        CREATE INDEX IF NOT EXISTS item_jobs_owner
+            ON item_jobs (owner_id);
+        CREATE INDEX IF NOT EXISTS item_jobs_job
+            ON item_jobs (job_id, job_level);
         ''')
 
-    def insert_row(self, conn):
+    def insert_row(self, conn, snapshot_id: int):
         conn.execute('''
         INSERT INTO item_instances(
-            item_id, amount, level, original_level, rarity, status,
-            slot_pos1, slot_pos2, summon_id, summon_level
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            snapshot_id, item_id, amount, level, original_level, rarity,
+            status, slot_pos1, slot_pos2, summon_id, summon_level
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (
-            self.item_id, self.amount, self.level, self.original_level, 
+            snapshot_id, self.item_id, self.amount, self.level, self.original_level, 
             self.rarity, self.status, self.slot_pos[0], self.slot_pos[1],
             self.summon[0], self.summon[1]
         ))
@@ -256,13 +315,14 @@ class Item:
     def name(self) -> str:
         if self.item_id == 0:
             return '(none)'
-        return ItemsDB[self.item_id].name
+        name = Lookup.item_names.get(self.item_id)
+        return name if name is not None else ItemsDB[self.item_id].name
 
     @property
     def type(self) -> str:
         if self.item_id == 0:
             return '(none)'
-        return ItemsDB[self.item_id].type
+        return Lookup.item_types[self.item_id]
 
     def __repr__(self) -> str:
         values = dict(self.__dict__)
@@ -283,6 +343,24 @@ class Item:
         self.status = (self.status & ~0x02) | 0x02 * locked
         self.set_status(self.status)
         
+    def duplicate_key(self) -> tuple:
+        '''
+        The same for items that only differ in where they are, their status,
+        their job affinity and the order of their effects and skills. Skills,
+        jobs and the summon are part of it, so an item kept for one of those
+        is never a duplicate of one without it. The effects are read straight
+        from the buffer, rather than from the Effect objects.
+        '''
+        view = memoryview(self._buffer)[
+            Effect.FIRST:Effect.FIRST + Effect.COUNT * Effect.SIZE]
+        effects = sorted((effect_id, affinity_level, raw_amount)
+                         for effect_id, raw_amount, affinity_level
+                         in Effect.KEY_STRUCT.iter_unpack(view)
+                         if effect_id != 0)
+        skills = sorted(skill for skill in self.skills if skill != 0)
+        return (self.item_id, self.level, tuple(effects), tuple(skills),
+                self.job1[0], self.job2[0], self.summon)
+
     @property
     def is_in_inventory(self) -> bool:
         return bool(self.status & 0x08)
@@ -328,40 +406,183 @@ class Item:
         return '\n'.join(
             textwrap.wrap(' '.join(textwrap.wrap(self._buffer.hex(), 2)), 48))
 
-    def should_keep(self) -> bool:
+    def should_keep(self, rules: Optional[Rules] = None,
+                    effects: bool = True,
+                    explain: Optional[Explanation] = None) -> bool:
         db_entry = ItemsDB.get(self.item_id)
         if not db_entry or not db_entry.slots:
             return False
 
-        filters = Config['Effects']
-
-        for effect in self.effects:
-            if filters.getint(effect.name,
-                              fallback=-1) < effect.affinity_level:
-                return True
+        if rules is None:
+            rules = Rules.default()
+
+        if effects:
+            if explain is not None:
+                start = explain.start()
+            for effect in self.effects:
+                if rules.effect_threshold(effect.name) < effect.affinity_level:
+                    if explain is not None:
+                        explain.evaluated('effect', start)
+                        explain.hit('effect', self, effect.name)
+                    return True
+            if explain is not None:
+                explain.evaluated('effect', start)
 
         slot_type = db_entry.slots
         if slot_type != 'Accessory':
-            try:
-                if Config['Keep Artifacts'].getboolean(slot_type,
-                                                       fallback=False):
-                    if self.job1[0] != 0 and self.job2[0] != 0:
-                        return True
-
-            except ValueError:
-                if Config['Keep Artifacts'].get(slot_type,
-                                                fallback='') == 'blessed':
-                    if self.summon[0] != 0:
-                        return True
-
-            min_affinity = Config['Minimum Affinity'].getint(slot_type,
-                                                             fallback=9999)
-            if self.job1[1] >= min_affinity:
+            if explain is not None:
+                start = explain.start()
+            keep_artifacts = rules.keep_artifacts(slot_type)
+            if keep_artifacts is True:
+                if self.job1[0] != 0 and self.job2[0] != 0:
+                    if explain is not None:
+                        explain.evaluated('artifact', start)
+                        explain.hit('artifact', self, slot_type)
+                    return True
+                if explain is not None:
+                    explain.evaluated('artifact', start)
+            elif keep_artifacts == 'blessed':
+                if self.summon[0] != 0:
+                    if explain is not None:
+                        explain.evaluated('blessed', start)
+                        explain.hit('blessed', self, slot_type)
+                    return True
+                if explain is not None:
+                    explain.evaluated('blessed', start)
+
+            if explain is not None:
+                start = explain.start()
+            if self.job1[1] >= rules.minimum_affinity(slot_type):
+                if explain is not None:
+                    explain.evaluated('affinity', start)
+                    explain.hit('affinity', self, slot_type)
                 return True
+            if explain is not None:
+                explain.evaluated('affinity', start)
 
         return False
 
 
+class ItemFilter:
+    '''
+    The inventory filter, one item at a time.
+
+    feed() decides each item as it arrives. Keeping a few of each skill or
+    effect depends on the whole inventory, so finish() returns the extra items
+    to keep once every item has been fed. Only the bounded candidate heaps are
+    held onto in between.
+    '''
+
+    def __init__(self,
+                 rules: Optional[Rules] = None,
+                 cache: Optional[DecisionCache] = None,
+                 explain: Optional[Explanation] = None) -> None:
+        self.rules = rules if rules is not None else Rules.default()
+        self.cache = cache
+        self.explain = explain
+
+        self.weapon_kept: Dict[int, int] = defaultdict(int)
+        self.acc_kept: Dict[int, int] = defaultdict(int)
+        self.effect_kept: Dict[int, int] = defaultdict(int)
+
+        self.weapon_best: TopK[Item] = TopK(
+            self.rules.weapon_skill_count
+            if self.rules.keep_weapon_skills else 0)
+        self.acc_best: TopK[Item] = TopK(
+            self.rules.accessory_skill_count
+            if self.rules.keep_accessory_skills else 0)
+        self.effect_best: TopK[Item] = TopK(self.rules.effect_count)
+
+    def feed(self, item: Item) -> bool:
+        rules = self.rules
+        db_item = ItemsDB.get(item.item_id)
+        if db_item is None:
+            return False
+
+        explain = self.explain
+        if explain is not None:
+            # The cache only knows whether an item was kept, not why.
+            keep = item.should_keep(rules, explain=explain)
+            start = explain.start()
+        elif self.cache is not None:
+            keep = self.cache.should_keep(item, rules)
+        else:
+            keep = item.should_keep(rules)
+
+        for skill in item.skills:
+            if skill != 0:
+                item_type = db_item.slots
+                if 'Weapon' in item_type:
+                    counts, best = self.weapon_kept, self.weapon_best
+                elif 'Accessory' in item_type:
+                    counts, best = self.acc_kept, self.acc_best
+                else:
+                    raise Exception(
+                        f'unexpected skill {skill} on {item.name}')
+                if keep:
+                    counts[skill] += 1
+                else:
+                    best.push(skill, rules.skill_rank(item), item)
+        if explain is not None and any(item.skills):
+            explain.evaluated('skill', start)
+            start = explain.start()
+
+        if self.effect_best and db_item.slots:
+            for effect in item.effects:
+                if keep:
+                    self.effect_kept[effect.effect_id] += 1
+                else:
+                    self.effect_best.push(effect.effect_id,
+                                          rules.effect_rank(item, effect), item)
+            if explain is not None:
+                explain.evaluated('best', start)
+
+        return keep
+
+    def finish(self) -> List[Item]:
+        # Top up every group that the rules didn't already keep enough items
+        # for. An item taken for one group also counts toward every other
+        # group it's in, so groups are gone through in a fixed order.
+        results = []
+        kept = set()
+        for rule, counts, best in (
+                ('skill', self.weapon_kept, self.weapon_best),
+                ('skill', self.acc_kept, self.acc_best),
+                ('best', self.effect_kept, self.effect_best)):
+            for key in sorted(best.heaps):
+                for item in best.best(key, best.k):
+                    if counts[key] >= best.k:
+                        break
+                    # Already counted toward this group when it was taken.
+                    if id(item) in kept:
+                        continue
+                    results.append(item)
+                    kept.add(id(item))
+                    self._count_kept(item)
+                    if self.explain is not None:
+                        self.explain.hit(rule, item, self._line(rule, key))
+        return results
+
+    def _count_kept(self, item: Item) -> None:
+        '''Counts a topped up item toward every skill and effect group.'''
+        slot_type = ItemsDB[item.item_id].slots
+        for skill in item.skills:
+            if skill == 0:
+                continue
+            if 'Weapon' in slot_type:
+                self.weapon_kept[skill] += 1
+            elif 'Accessory' in slot_type:
+                self.acc_kept[skill] += 1
+        if self.effect_best and slot_type:
+            for effect in item.effects:
+                self.effect_kept[effect.effect_id] += 1
+
+    def _line(self, rule: str, key: int) -> str:
+        if rule == 'best':
+            return Lookup.effect_strings.get(key, str(key))
+        return f'skill {key}'
+
+
 @dataclass
 class Inventory:
     items: List[Item]
@@ -372,100 +593,137 @@ class Inventory:
             for item in self.items:
                 f.write(item._buffer)
 
-    def filter(self) -> List[Item]:
-        results = []
-        weapon_skills: Dict[int, bool] = defaultdict(bool)
-        acc_skills: Dict[int, bool] = defaultdict(bool)
+    def filter(self,
+               rules: Optional[Rules] = None,
+               cache: Optional[DecisionCache] = None,
+               explain: Optional[Explanation] = None) -> List[Item]:
+        item_filter = ItemFilter(rules, cache, explain)
+        results = [item for item in self.items if item_filter.feed(item)]
+        results.extend(item_filter.finish())
+        return results
 
-        not_kept = []
+    def dedupe(self,
+               rules: Optional[Rules] = None,
+               cache: Optional[DecisionCache] = None) -> List[Item]:
+        '''
+        Like filter, but of the kept items that are duplicates of each other,
+        only keeps the ones with the most affinity, up to the [Duplicates]
+        count.
+        '''
+        if rules is None:
+            rules = Rules.default()
+        groups: Dict[tuple, List[Item]] = defaultdict(list)
+        for item in self.filter(rules, cache):
+            groups[item.duplicate_key()].append(item)
 
-        for item in self.items:
-            db_item = ItemsDB.get(item.item_id)
-            if db_item is None:
-                continue
-
-            keep = item.should_keep()
-            if keep:
-                results.append(item)
-            else:
-                not_kept.append(item)
-
-            for skill in item.skills:
-                if skill != 0:
-                    item_type = db_item.slots
-                    if 'Weapon' in item_type:
-                        weapon_skills[skill] |= keep
-                    elif 'Accessory' in item_type:
-                        acc_skills[skill] |= keep
-                    else:
-                        raise Exception(
-                            f'unexpected skill {skill} on {item.name}')
-
-        for item in not_kept:
-            for skill in item.skills:
-                if skill != 0:
-                    if Config['Skills'].getboolean(
-                            'Keep One Of Each Weapon Skill'):
-                        if weapon_skills.get(skill) is False:
-                            results.append(item)
-                            weapon_skills[skill] = True
-                    if Config['Skills'].getboolean(
-                            'Keep One Of Each Accessory Skill'):
-                        if acc_skills.get(skill) is False:
-                            results.append(item)
-                            acc_skills[skill] = True
+        results = []
+        for group in groups.values():
+            group.sort(key=lambda item: item.job1[1], reverse=True)
+            results.extend(group[:rules.duplicate_count])
+        return results
 
+    def cover(self, rules: Optional[Rules] = None) -> List[Item]:
+        '''
+        Like filter, but instead of keeping every item over an [Effects]
+        threshold and one of each skill, keeps a small set of items that
+        still covers all of them. Artifact and affinity rules still apply.
+        '''
+        if rules is None:
+            rules = Rules.default()
+        results = [item for item in self.items
+                   if item.should_keep(rules, effects=False)]
+        results.extend(minimal_cover(self.items, rules, results))
         return results
         
     @classmethod
-    def find_offset(cls) -> int:
-        pm = pymem.Pymem('SOPFFO.exe')
+    def find_offset(cls, pm: Optional[Process] = None) -> int:
+        if pm is None:
+            pm = open_process()
         
+        def read_item(address: int) -> Item:
+            data = pm.read_bytes(address, Item.STRUCT_SIZE)
+            try:
+                return Item.from_bytes(data)
+            except InvalidItemException:
+                # It may have been read while the game was changing it, so
+                # make sure before giving up on it.
+                [(_, data)] = stabilize(pm, [(address, data)], READ_RETRIES)
+                return Item.from_bytes(data)
+
         def scan_back(address: int) -> int:
             try:
                 while True:
-                    i = Item.from_bytes(pm.read_bytes(address, Item.STRUCT_SIZE))
+                    read_item(address)
                     address -= Item.STRUCT_SIZE
-            except InvalidItemException:
+            except (InvalidItemException, UnstableReadException):
                 return address + Item.STRUCT_SIZE
         
         # Look for the potion item ID. Everyone should have this.
         possible_potions = pm.pattern_scan_module(b'\xe7\x05\x00\x00\xe7\x05\x00\x00', 'SOPFFO.exe', return_multiple=True)
-        for addr in possible_potions:
-            Item.ITEMS_START = scan_back(addr) - pm.base_address
+        # Walking back from each candidate is independent, so do them all at
+        # once and check the results in order.
+        with RegionReader(pm, Item.STRUCT_SIZE, READ_THREADS) as reader:
+            starts = list(reader.map(scan_back, possible_potions))
+        for start in starts:
+            Item.ITEMS_START = start - pm.base_address
             try:
-                _ = Inventory.from_process(pm)
+                _ = Inventory.from_process(pm, consistent=True)
                 return Item.ITEMS_START
-            except InvalidItemException:
+            except (InvalidItemException, UnstableReadException):
                 continue
                 
         raise Exception('Could not find inventory offset!')
 
     @classmethod
-    def from_process(cls, pm: Optional[pymem.Pymem] = None) -> Inventory:
+    def from_process(cls, pm: Optional[Process] = None,
+                     consistent: bool = CONSISTENT_READS) -> Inventory:
         if pm is None:
-            pm = pymem.Pymem('SOPFFO.exe')
-            
-        # Addresses discovered with:
-        # a = pm.pattern_scan_module(b'([^\\x00]...|.[^\\x00]..)\\1..[^\\x00][^\\x00]', 'SOPFFO.exe', return_multiple=True)
-        # b = [(x, ItemsDB.get(pm.read_uint(x))) for x in a]
-        # c = [x for x in b if x[1] and x[1].name]
-        # inv = [Item.from_bytes(pm.read_bytes(x, Item.STRUCT_SIZE), address=x, process=pm) for x, _ in c]
+            pm = open_process()
             
-        items = []
-        for i in range(600):
-            address = pm.base_address + 68785416 + i * Item.STRUCT_SIZE
-            item = Item.from_process(pm, address)
-            if item and item.is_in_inventory:
-                items.append(item)
-        for i in range(5500):
-            address = pm.base_address + 69966560 + i * Item.STRUCT_SIZE
-            item = Item.from_process(pm, address)
-            if item and item.is_in_inventory:
-                items.append(item)
+        items = [item for item in cls.iter_process(pm, consistent=consistent)
+                 if item.is_in_inventory]
         
         return cls(items)
 
+    @classmethod
+    def iter_chunks(cls,
+                    pm: Process,
+                    chunk_slots: int = CHUNK_SLOTS,
+                    threads: int = READ_THREADS,
+                    consistent: bool = CONSISTENT_READS
+                    ) -> Generator[Tuple[int, bytes], None, None]:
+        '''
+        With `consistent`, nothing is yielded until every chunk has been
+        checked against a second read (see reader.stabilize).
+        '''
+        regions = [(pm.base_address + offset, count * Item.STRUCT_SIZE)
+                   for offset, count in REGIONS]
+        with RegionReader(pm, chunk_slots * Item.STRUCT_SIZE,
+                          threads) as reader:
+            if consistent:
+                yield from reader.read_stable(regions, READ_RETRIES)
+            else:
+                yield from reader.read(regions)
+
+    @classmethod
+    def parse_chunk(cls, pm: Optional[Process], address: int,
+                    data: bytes) -> Generator[Item, None, None]:
+        for index in range(0, len(data), Item.STRUCT_SIZE):
+            item = Item.from_bytes(data[index:index + Item.STRUCT_SIZE],
+                                   address=address + index, process=pm)
+            if item:
+                yield item
+
+    @classmethod
+    def iter_process(cls,
+                     pm: Process,
+                     chunk_slots: int = CHUNK_SLOTS,
+                     consistent: bool = CONSISTENT_READS
+                     ) -> Generator[Item, None, None]:
+        for address, data in cls.iter_chunks(pm, chunk_slots,
+                                             consistent=consistent):
+            yield from cls.parse_chunk(pm, address, data)
+
     @classmethod
     def from_file(cls, filename: Path) -> Inventory:
         items = []
@@ -0,0 +1,231 @@
+'''
+Finds the best loadout out of the items you own.
+
+A loadout is scored as the weighted sum of its effect amounts. Every equipment
+position gets a list of options (including leaving it empty), options that are
+beaten on every count by another option for the same position are dropped,
+and then a depth-first branch-and-bound search picks one option per position.
+'''
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import click
+
+from database import ItemsDB, JobsDB, Lookup, SLOT_TYPES
+from memory import Item
+
+# Positions in the order they're searched. Body and Main Hand go first since
+# they decide whether Head/Leg and Off Hand are available at all.
+POSITIONS = ('Body', 'Main Hand', 'Off Hand', 'Head', 'Arm', 'Leg', 'Foot',
+             'Accessory')
+
+ARMOUR_POSITIONS = ('Head', 'Arm', 'Leg', 'Foot')
+
+
+@dataclass
+class Objective:
+    # Lowercased effect name -> weight per point of raw_amount.
+    weights: Dict[str, float]
+    # Lowercased effect name -> minimum affinity level.
+    required: Dict[str, int] = field(default_factory=dict)
+    job_id: Optional[int] = None
+    min_affinity: int = 0
+
+    @classmethod
+    def parse(cls,
+              weights: Sequence[str],
+              required: Sequence[str] = (),
+              job: Optional[str] = None,
+              min_affinity: int = 0) -> Objective:
+        '''
+        Builds an objective from NAME=VALUE strings. Raises
+        click.BadParameter for anything malformed or any unknown effect, so
+        that a typo can't quietly change what's being optimized.
+        '''
+        effects = {name.lower() for name in Lookup.effect_strings.values()}
+
+        def effect_name(name: str, option: str) -> str:
+            name = name.strip().lower()
+            if name not in effects:
+                raise click.BadParameter(f'Unknown effect: {name!r}',
+                                         param_hint=option)
+            return name
+
+        parsed_weights = {}
+        for weight in weights:
+            name, equals, value = weight.rpartition('=')
+            if not equals:
+                raise click.BadParameter(
+                    f'Expected EFFECT=WEIGHT but got {weight!r}',
+                    param_hint='--weight')
+            try:
+                parsed_weights[effect_name(name, '--weight')] = float(value)
+            except ValueError:
+                raise click.BadParameter(f'Not a number: {value!r}',
+                                         param_hint='--weight')
+
+        parsed_required = {}
+        for requirement in required:
+            name, _, level = requirement.partition('=')
+            try:
+                parsed_required[effect_name(name, '--require')] = int(
+                    level or 0)
+            except ValueError:
+                raise click.BadParameter(f'Not a level: {level!r}',
+                                         param_hint='--require')
+
+        job_id = None
+        if job is not None:
+            matches = list(JobsDB.by_name(job))
+            if not matches:
+                raise click.BadParameter(f'Unknown job: {job}',
+                                         param_hint='--job')
+            job_id = matches[0].id
+
+        return cls(parsed_weights, parsed_required, job_id, min_affinity)
+
+
+@dataclass
+class Option:
+    item: Optional[Item]
+    score: float
+    # Bit i is set if the item satisfies the i-th required effect.
+    covers: int
+    affinity: int
+    # The position this option makes unavailable, if any.
+    blocks: Optional[str] = None
+
+    def dominates(self, other: Option) -> bool:
+        return (self.blocks == other.blocks
+                and self.score >= other.score
+                and self.affinity >= other.affinity
+                and self.covers | other.covers == self.covers)
+
+
+@dataclass
+class Loadout:
+    items: List[Item]
+    score: float
+    searched: int
+
+
+def positions_for(item: Item) -> List[Tuple[str, Optional[str]]]:
+    '''(position, position it blocks) for everywhere the item can go.'''
+    db_entry = ItemsDB.get(item.item_id)
+    if db_entry is None:
+        return []
+    slots = db_entry.slots
+    if slots == '2-Hand Weapon':
+        return [('Main Hand', 'Off Hand')]
+    if slots == '1-Hand Weapon':
+        return [('Main Hand', None)]
+    if slots == 'Shield':
+        return [('Off Hand', None)]
+    if slots == 'Accessory':
+        return [('Accessory', None)]
+    if db_entry.type == 'Body':
+        kind = SLOT_TYPES.get(db_entry.slot_type, 'Body')
+        if kind == 'Body-Head':
+            return [('Body', 'Head')]
+        if kind == 'Body-Leg':
+            return [('Body', 'Leg')]
+        return [('Body', None)]
+    if db_entry.type in ARMOUR_POSITIONS:
+        return [(db_entry.type, None)]
+    return []
+
+
+def make_option(item: Item, objective: Objective,
+                required: List[Tuple[str, int]],
+                blocks: Optional[str]) -> Option:
+    score = 0.0
+    covers = 0
+    for effect in item.effects:
+        name = effect.name.lower()
+        score += objective.weights.get(name, 0.0) * effect.raw_amount
+        for bit, (required_name, level) in enumerate(required):
+            if name == required_name and effect.affinity_level >= level:
+                covers |= 1 << bit
+
+    affinity = 0
+    if objective.job_id is not None:
+        for job in (item.job1, item.job2):
+            if job[0] == objective.job_id:
+                affinity += job[1]
+    return Option(item, score, covers, affinity, blocks)
+
+
+def pareto(options: List[Option]) -> List[Option]:
+    '''Drops every option that another option is at least as good as.'''
+    options = sorted(options, key=lambda o: (o.score, o.affinity,
+                                             bin(o.covers).count('1')),
+                     reverse=True)
+    front: List[Option] = []
+    for option in options:
+        if not any(other.dominates(option) for other in front):
+            front.append(option)
+    return front
+
+
+def optimize(items: Sequence[Item], objective: Objective) -> Optional[Loadout]:
+    required = list(objective.required.items())
+    full = (1 << len(required)) - 1
+
+    candidates: Dict[str, List[Option]] = {p: [] for p in POSITIONS}
+    for item in items:
+        for position, blocks in positions_for(item):
+            candidates[position].append(
+                make_option(item, objective, required, blocks))
+
+    empty = Option(None, 0.0, 0, 0)
+    options = [pareto(candidates[p] + [empty]) for p in POSITIONS]
+
+    # Optimistic totals for everything from position k onwards.
+    count = len(POSITIONS)
+    best_score = [0.0] * (count + 1)
+    best_affinity = [0] * (count + 1)
+    any_covers = [0] * (count + 1)
+    for k in reversed(range(count)):
+        best_score[k] = best_score[k + 1] + max(o.score for o in options[k])
+        best_affinity[k] = best_affinity[k + 1] + max(
+            o.affinity for o in options[k])
+        any_covers[k] = any_covers[k + 1]
+        for o in options[k]:
+            any_covers[k] |= o.covers
+
+    best: Optional[Tuple[float, List[Option]]] = None
+    searched = 0
+    chosen: List[Option] = []
+
+    def search(k: int, score: float, covers: int, affinity: int,
+               blocked: frozenset) -> None:
+        nonlocal best, searched
+        searched += 1
+        if best is not None and score + best_score[k] <= best[0]:
+            return
+        if covers | any_covers[k] != full:
+            return
+        if affinity + best_affinity[k] < objective.min_affinity:
+            return
+        if k == count:
+            best = (score, list(chosen))
+            return
+
+        position_options = options[k]
+        if POSITIONS[k] in blocked:
+            position_options = [empty]
+        for option in position_options:
+            chosen.append(option)
+            search(k + 1, score + option.score, covers | option.covers,
+                   affinity + option.affinity,
+                   blocked | {option.blocks} if option.blocks else blocked)
+            chosen.pop()
+
+    search(0, 0.0, 0, 0, frozenset())
+    if best is None:
+        return None
+    score, picked = best
+    return Loadout([o.item for o in picked if o.item is not None], score,
+                   searched)
@@ -0,0 +1,137 @@
+'''
+In-place patching of the game's data files.
+
+Database.save and Strings.save_file write out a whole file. These only touch
+the bytes that actually changed: fixed-size database entries are rewritten in
+place through mmap, and string files (whose records vary in length) are
+rewritten from the first changed record onwards. A backup of the original
+file is made before the first change, and the result is checked against the
+CRC-32 of what the whole file should contain. Each patch also copies the file
+to <name>.tmp first, so that a patch that fails the check can be undone
+without losing the patches before it.
+'''
+from __future__ import annotations
+
+import mmap
+import shutil
+import zlib
+from pathlib import Path
+from typing import List, Sequence
+
+
+class PatchError(Exception):
+    pass
+
+
+class LayoutError(PatchError):
+    '''The file isn't laid out the same way, so can't be patched in place.'''
+
+
+class VerificationError(PatchError):
+    '''The patched file didn't match, and was put back how it was.'''
+
+
+def backup(filename: Path) -> Path:
+    '''Copies the file to <name>.bak, unless a backup already exists.'''
+    backup_path = filename.with_name(filename.name + '.bak')
+    if not backup_path.exists():
+        shutil.copy2(filename, backup_path)
+    return backup_path
+
+
+def checksum(chunks: Sequence[bytes]) -> int:
+    crc = 0
+    for chunk in chunks:
+        crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def _snapshot(filename: Path) -> Path:
+    '''Copies the file to <name>.tmp, to go back to if the patch fails.'''
+    snapshot_path = filename.with_name(filename.name + '.tmp')
+    shutil.copy2(filename, snapshot_path)
+    return snapshot_path
+
+
+def _verify(filename: Path, expected: int, snapshot_path: Path) -> None:
+    with filename.open('rb') as f:
+        actual = zlib.crc32(f.read())
+    if actual != expected:
+        shutil.copy2(snapshot_path, filename)
+        snapshot_path.unlink()
+        raise VerificationError(
+            f'{filename} failed verification after patching; put it back '
+            'how it was before the patch.')
+    snapshot_path.unlink()
+
+
+def patch_entries(filename: Path, header: bytes, entries: Sequence[bytes],
+                  entry_size: int) -> int:
+    '''
+    Rewrites the fixed-size entries that differ from `entries`, in place.
+    Returns the number of entries written. Raises LayoutError if the file
+    doesn't have the same layout, since that can't be patched in place.
+    '''
+    expected_size = len(header) + len(entries) * entry_size
+    if filename.stat().st_size != expected_size:
+        raise LayoutError(f'{filename} is not {expected_size} bytes long.')
+    if any(len(entry) != entry_size for entry in entries):
+        raise LayoutError('Entries must all be the same size.')
+
+    with filename.open('r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        if mm[:len(header)] != header:
+            raise LayoutError(f'{filename} has a different header.')
+
+        changed: List[int] = []
+        offset = len(header)
+        for index, entry in enumerate(entries):
+            if mm[offset:offset + entry_size] != entry:
+                changed.append(index)
+            offset += entry_size
+
+        if not changed:
+            return 0
+
+        backup(filename)
+        snapshot_path = _snapshot(filename)
+        for index in changed:
+            offset = len(header) + index * entry_size
+            mm[offset:offset + entry_size] = entries[index]
+        mm.flush()
+
+    _verify(filename, checksum([header, *entries]), snapshot_path)
+    return len(changed)
+
+
+def patch_records(filename: Path, records: Sequence[bytes]) -> int:
+    '''
+    Rewrites a file of variable-length records from the first record that
+    differs onwards. Returns the number of bytes written.
+    '''
+    size = filename.stat().st_size
+    # The file already holds records[:first], which end at `start`.
+    start = 0
+    first = 0
+    if size:
+        with filename.open('rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for record in records:
+                end = start + len(record)
+                if mm[start:end] != record:
+                    break
+                start = end
+                first += 1
+
+    tail = b''.join(records[first:])
+    if not tail and start == size:
+        return 0
+
+    backup(filename)
+    snapshot_path = _snapshot(filename)
+    with filename.open('r+b') as f:
+        f.seek(start)
+        f.write(tail)
+        f.truncate()
+
+    _verify(filename, checksum(records), snapshot_path)
+    return len(tail)
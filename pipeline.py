@@ -0,0 +1,151 @@
+'''
+Streaming version of filter_inventory.
+
+The game memory is read in chunks on one thread, parsed and filtered on the
+calling thread, and the resulting statuses are written back on another. The
+queues between them are bounded, so only a few chunks are ever held in memory,
+and writes for the first chunks happen while later chunks are still being read.
+
+The final statuses are the same as marking everything with the output marker
+and then unmarking the items that Inventory.filter keeps. The writes go
+through a WriteScheduler, a slice at a time, so the game doesn't stutter.
+'''
+from __future__ import annotations
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+from decisions import DecisionCache
+from journal import Journal
+from memory import CHUNK_SLOTS, Inventory, Item, ItemFilter
+from process import Process
+from rules import Rules
+from scheduler import WriteScheduler
+
+# Marks the end of a queue.
+_DONE = object()
+
+
+@dataclass
+class StreamResult:
+    items: int = 0
+    kept: int = 0
+
+
+class _Worker(threading.Thread):
+    '''
+    A thread that remembers the exception it died with, and tells the other
+    stages to stop.
+    '''
+
+    def __init__(self, target: Callable[[], None],
+                 stop: threading.Event) -> None:
+        super().__init__(daemon=True)
+        self._target_func = target
+        self._stop_event = stop
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            self._target_func()
+        except BaseException as e:
+            self.error = e
+            self._stop_event.set()
+
+
+def _put(q: queue.Queue, value: Any, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(value, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event) -> Any:
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def filter_streaming(pm: Process,
+                     rules: Optional[Rules] = None,
+                     cache: Optional[DecisionCache] = None,
+                     chunk_slots: int = CHUNK_SLOTS,
+                     queue_chunks: int = 4,
+                     journal: Optional[Journal] = None) -> StreamResult:
+    scheduler = WriteScheduler(pm)
+    chunks: queue.Queue = queue.Queue(maxsize=queue_chunks)
+    writes: queue.Queue = queue.Queue(maxsize=queue_chunks * chunk_slots)
+    stop = threading.Event()
+
+    def read() -> None:
+        for chunk in Inventory.iter_chunks(pm, chunk_slots):
+            if not _put(chunks, chunk, stop):
+                return
+        _put(chunks, _DONE, stop)
+
+    def write() -> None:
+        while True:
+            entry = _get(writes, stop)
+            if entry is _DONE:
+                # After an error or Ctrl+C, drop whatever hasn't been written
+                # yet rather than finishing a half-done filter.
+                if stop.is_set():
+                    scheduler.cancel()
+                scheduler.flush()
+                return
+            item, keep = entry
+            if keep:
+                item.unset_marker(Item.OUTPUT_MARKER)
+            else:
+                item.set_marker(Item.OUTPUT_MARKER)
+            if scheduler.ready:
+                scheduler.run_slice()
+
+    reader = _Worker(read, stop)
+    writer = _Worker(write, stop)
+    reader.start()
+    writer.start()
+
+    result = StreamResult()
+    item_filter = ItemFilter(rules, cache)
+    try:
+        while True:
+            chunk = _get(chunks, stop)
+            if chunk is _DONE:
+                break
+            address, data = chunk
+            for item in Inventory.parse_chunk(scheduler, address, data):
+                if not item.is_in_inventory:
+                    continue
+                if journal is not None:
+                    journal.record(item)
+                keep = item_filter.feed(item)
+                result.items += 1
+                result.kept += keep
+                _put(writes, (item, keep), stop)
+
+        if not stop.is_set():
+            for item in item_filter.finish():
+                result.kept += 1
+                _put(writes, (item, True), stop)
+            _put(writes, _DONE, stop)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        writer.join()
+        reader.join()
+
+    for worker in (reader, writer):
+        if worker.error is not None:
+            raise worker.error
+    return result
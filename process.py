@@ -0,0 +1,306 @@
+'''
+Attaching to the game's process.
+
+pymem only works on Windows. Under Wine or Proton on Linux, the game is an
+ordinary Linux process, so LinuxProcess finds it through /proc and reads and
+writes its memory with process_vm_readv/process_vm_writev, falling back to
+/proc/<pid>/mem where those aren't allowed. Both provide the same handful of
+methods, so the rest of the tool doesn't care which one it has.
+'''
+from __future__ import annotations
+
+import ctypes
+import errno
+import os
+import re
+import struct
+import sys
+from typing import Any, List, Optional, Protocol, Sequence, Tuple
+
+if sys.platform == 'win32':
+    import pymem
+else:
+    pymem = None
+
+GAME = 'SOPFFO.exe'
+
+# Most iovecs the kernel takes in one call.
+IOV_MAX = 1024
+
+# The module is pattern scanned this many bytes at a time. Matches are allowed
+# to run this far past the end of a piece.
+SCAN_CHUNK = 4 * 1024 * 1024
+SCAN_OVERLAP = 256
+
+
+class ProcessNotFoundException(Exception):
+    pass
+
+
+class Process(Protocol):
+    '''The parts of pymem.Pymem that this tool uses.'''
+    base_address: int
+
+    def read_bytes(self, address: int, length: int) -> bytes: ...
+
+    def read_uint(self, address: int) -> int: ...
+
+    def write_bytes(self, address: int, value: bytes, length: int) -> None: ...
+
+    def write_uint(self, address: int, value: int) -> None: ...
+
+    def pattern_scan_module(self, pattern: bytes, module: str,
+                            return_multiple: bool = False) -> Any: ...
+
+
+def open_process(name: str = GAME) -> Process:
+    if pymem is not None:
+        return pymem.Pymem(name)
+    if sys.platform.startswith('linux'):
+        return LinuxProcess.from_name(name)
+    raise ProcessNotFoundException(
+        f'Reading game memory isn\'t supported on {sys.platform}.')
+
+
+def read_many(process: Process,
+              ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+    '''Reads every (address, size), in as few calls as the process allows.'''
+    batched = getattr(process, 'read_many', None)
+    if batched is not None:
+        return batched(ranges)
+    return [process.read_bytes(address, size) for address, size in ranges]
+
+
+def write_many(process: Process,
+               writes: Sequence[Tuple[int, bytes]]) -> None:
+    '''Writes every (address, data), in as few calls as the process allows.'''
+    batched = getattr(process, 'write_many', None)
+    if batched is not None:
+        batched(writes)
+        return
+    for address, data in writes:
+        process.write_bytes(address, data, len(data))
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+def _syscall(name: str) -> Optional[Any]:
+    try:
+        func = getattr(ctypes.CDLL(None, use_errno=True), name)
+    except (AttributeError, OSError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.POINTER(_IOVec), ctypes.c_ulong,
+                     ctypes.POINTER(_IOVec), ctypes.c_ulong, ctypes.c_ulong]
+    func.restype = ctypes.c_ssize_t
+    return func
+
+
+_process_vm_readv = _syscall('process_vm_readv')
+_process_vm_writev = _syscall('process_vm_writev')
+
+
+def _command_name(argument: bytes) -> str:
+    '''The file name of argv[0], whether it's a Linux or a Wine path.'''
+    return re.split(r'[\\/]', argument.decode('utf-8', 'replace'))[-1]
+
+
+class LinuxProcess:
+    def __init__(self, pid: int, module: str = GAME) -> None:
+        self.pid = pid
+        self.module = module
+        self._mem: Optional[int] = None
+        # Cleared the first time the kernel refuses process_vm_readv/writev.
+        self._use_vm = (_process_vm_readv is not None
+                        and _process_vm_writev is not None)
+        self.base_address = self.module_range(module)[0]
+
+    @classmethod
+    def from_name(cls, name: str = GAME) -> LinuxProcess:
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                    argv = f.read().split(b'\0')
+            except OSError:
+                continue
+            if argv[0] and _command_name(argv[0]).lower() == name.lower():
+                return cls(int(entry), name)
+        raise ProcessNotFoundException(f'Could not find {name}. Is it running?')
+
+    def close(self) -> None:
+        if self._mem is not None:
+            os.close(self._mem)
+            self._mem = None
+
+    def maps(self) -> List[Tuple[int, int, str, str]]:
+        '''(start, end, permissions, path) of every mapping in the process.'''
+        results = []
+        with open(f'/proc/{self.pid}/maps') as f:
+            for line in f:
+                fields = line.split(maxsplit=5)
+                start, end = (int(x, 16) for x in fields[0].split('-'))
+                path = fields[5].strip() if len(fields) > 5 else ''
+                results.append((start, end, fields[1], path))
+        return results
+
+    def module_range(self, module: str) -> Tuple[int, int]:
+        '''The (start, end) addresses of a loaded module.'''
+        mappings = [(start, end) for start, end, _, path in self.maps()
+                    if os.path.basename(path).lower() == module.lower()]
+        if not mappings:
+            raise ProcessNotFoundException(
+                f'{module} isn\'t loaded in process {self.pid}.')
+        start = min(start for start, _ in mappings)
+        end = max(end for _, end in mappings)
+
+        # Like pymem, go by the size in the PE header if there is one, since
+        # Wine maps the uninitialized data after the image anonymously.
+        try:
+            header = self.read_bytes(start, 0x40)
+            if header[:2] == b'MZ':
+                pe = struct.unpack_from('<I', header, 0x3C)[0]
+                signature, = struct.unpack('<4s', self.read_bytes(start + pe, 4))
+                if signature == b'PE\0\0':
+                    end = start + self.read_uint(start + pe + 24 + 56)
+        except MemoryError:
+            pass
+        return start, end
+
+    def _open_mem(self) -> int:
+        if self._mem is None:
+            try:
+                self._mem = os.open(f'/proc/{self.pid}/mem', os.O_RDWR)
+            except PermissionError:
+                self._mem = os.open(f'/proc/{self.pid}/mem', os.O_RDONLY)
+        return self._mem
+
+    def _vm_call(self, func: Any, buffer: Any,
+                 ranges: Sequence[Tuple[int, int]]) -> int:
+        '''
+        One process_vm_readv/writev call: one local iovec covering the whole
+        buffer, and one remote iovec per range. Returns the number of ranges
+        done in full, or -1 if the calls aren't allowed at all.
+        '''
+        remote = (_IOVec * len(ranges))(
+            *((address, size) for address, size in ranges))
+        local_iov = _IOVec(ctypes.cast(buffer, ctypes.c_void_p),
+                           ctypes.sizeof(buffer))
+        done = func(self.pid, ctypes.byref(local_iov), 1, remote, len(ranges),
+                    0)
+        if done < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOSYS, errno.EPERM):
+                self._use_vm = False
+                return -1
+            if error == errno.ESRCH:
+                raise ProcessNotFoundException(
+                    f'Process {self.pid} has exited.')
+            return 0
+        # The kernel never splits a range, so this is a whole number of them.
+        count = 0
+        for _, size in ranges:
+            if done < size:
+                break
+            done -= size
+            count += 1
+        return count
+
+    def read_many(self, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        results: List[bytes] = []
+        ranges = list(ranges)
+        while len(results) < len(ranges):
+            batch = ranges[len(results):len(results) + IOV_MAX]
+            count = -1
+            if self._use_vm:
+                size = sum(size for _, size in batch)
+                buffer = ctypes.create_string_buffer(size)
+                count = self._vm_call(_process_vm_readv, buffer, batch)
+                data = buffer.raw
+                offset = 0
+                for _, size in batch[:max(count, 0)]:
+                    results.append(data[offset:offset + size])
+                    offset += size
+            if count <= 0:
+                # Not allowed, or the next range isn't readable: find out
+                # which through /proc/<pid>/mem.
+                address, size = batch[0]
+                results.append(self._read_mem(address, size))
+        return results
+
+    def write_many(self, writes: Sequence[Tuple[int, bytes]]) -> None:
+        writes = list(writes)
+        written = 0
+        while written < len(writes):
+            batch = writes[written:written + IOV_MAX]
+            count = -1
+            if self._use_vm:
+                local = b''.join(data for _, data in batch)
+                buffer = ctypes.create_string_buffer(local, len(local))
+                count = self._vm_call(
+                    _process_vm_writev, buffer,
+                    [(address, len(data)) for address, data in batch])
+                written += max(count, 0)
+            if count <= 0:
+                address, data = batch[0]
+                self._write_mem(address, data)
+                written += 1
+
+    def _read_mem(self, address: int, size: int) -> bytes:
+        try:
+            data = os.pread(self._open_mem(), size, address)
+        except OSError:
+            data = b''
+        if len(data) != size:
+            raise MemoryError(f'Could not read {size} bytes at {address:#x}')
+        return data
+
+    def _write_mem(self, address: int, data: bytes) -> None:
+        try:
+            written = os.pwrite(self._open_mem(), data, address)
+        except OSError:
+            written = 0
+        if written != len(data):
+            raise MemoryError(
+                f'Could not write {len(data)} bytes at {address:#x}')
+
+    def read_bytes(self, address: int, length: int) -> bytes:
+        return self.read_many([(address, length)])[0]
+
+    def read_uint(self, address: int) -> int:
+        return struct.unpack('<I', self.read_bytes(address, 4))[0]
+
+    def write_bytes(self, address: int, value: bytes, length: int) -> None:
+        self.write_many([(address, bytes(value[:length]))])
+
+    def write_uint(self, address: int, value: int) -> None:
+        self.write_bytes(address, struct.pack('<I', value), 4)
+
+    def pattern_scan_module(self, pattern: bytes, module: str,
+                            return_multiple: bool = False
+                            ) -> Any:
+        start, end = self.module_range(module)
+        regex = re.compile(pattern, re.DOTALL)
+        found: List[int] = []
+        for map_start, map_end, permissions, _ in self.maps():
+            map_start, map_end = max(map_start, start), min(map_end, end)
+            if map_start >= map_end or 'r' not in permissions:
+                continue
+            for piece in range(map_start, map_end, SCAN_CHUNK):
+                size = min(SCAN_CHUNK + SCAN_OVERLAP, map_end - piece)
+                try:
+                    data = self.read_bytes(piece, size)
+                except MemoryError:
+                    continue
+                for match in regex.finditer(data):
+                    # Matches in the overlap are found again with the next
+                    # piece.
+                    if match.start() < SCAN_CHUNK:
+                        found.append(piece + match.start())
+                if found and not return_multiple:
+                    return found[0]
+        if return_multiple:
+            return found
+        return found[0] if found else None
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import (Any, Callable, Deque, Generator, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple, TypeVar)
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+class UnstableReadException(Exception):
+    pass
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def stabilize(process: Any, chunks: Sequence[Tuple[int, bytes]],
+              retries: int, pool: Optional[Executor] = None
+              ) -> List[Tuple[int, bytes]]:
+    '''
+    Checks already read (address, data) chunks against a second read, so that
+    none of them were caught halfway through the game changing them.
+
+    Every chunk is read and hashed again, and compared with the first read.
+    Only the chunks that changed are read again, until each one hashes the
+    same twice in a row, at most `retries` more times. With a pool, the
+    chunks are read and hashed on its threads.
+    '''
+    def read_hash(chunk: Tuple[int, int]) -> Tuple[bytes, bytes]:
+        data = process.read_bytes(*chunk)
+        return data, _digest(data)
+
+    results = list(chunks)
+    digests = [_digest(data) for _, data in results]
+    changed = list(range(len(results)))
+    for _ in range(retries + 1):
+        ranges = [(results[i][0], len(results[i][1])) for i in changed]
+        if pool is None:
+            again = map(read_hash, ranges)
+        else:
+            again = pool.map(read_hash, ranges)
+        still_changing = []
+        for i, (data, digest) in zip(changed, again):
+            if digest != digests[i]:
+                results[i] = (results[i][0], data)
+                digests[i] = digest
+                still_changing.append(i)
+        changed = still_changing
+        if not changed:
+            return results
+    raise UnstableReadException(
+        f'{len(changed)} chunks were still changing after {retries} retries, '
+        f'starting at {results[changed[0]][0]:#x}.')
+
+
+class RegionReader:
+    '''
+    Reads regions of another process's memory on a small thread pool.
+
+    Regions are split into chunks of at most chunk_size bytes, and up to
+    `concurrency` chunks are read at the same time. Reading another process's
+    memory doesn't hold the GIL, so this overlaps the time spent waiting on
+    each read. Chunks are still returned in address order.
+
+    `process` only needs a read_bytes(address, size) method, like pymem.Pymem.
+    '''
+
+    def __init__(self, process: Any, chunk_size: int,
+                 concurrency: int = 4) -> None:
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive')
+        self.process = process
+        self.chunk_size = chunk_size
+        self.concurrency = max(1, concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=self.concurrency,
+                                       thread_name_prefix='RegionReader')
+
+    def __enter__(self) -> RegionReader:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def split(self, regions: Iterable[Tuple[int, int]]
+              ) -> List[Tuple[int, int]]:
+        '''Turns (address, size) regions into (address, size) chunks.'''
+        chunks = []
+        for address, size in sorted(regions):
+            for offset in range(0, size, self.chunk_size):
+                chunks.append(
+                    (address + offset, min(self.chunk_size, size - offset)))
+        return chunks
+
+    def read(self, regions: Iterable[Tuple[int, int]]
+             ) -> Generator[Tuple[int, bytes], None, None]:
+        '''Yields (address, data) for every chunk of the given regions.'''
+        pending: Deque[Tuple[int, Future]] = collections.deque()
+        chunks = iter(self.split(regions))
+
+        # Keep a couple of reads queued up per thread, rather than submitting
+        # everything at once, so that a slow consumer keeps memory bounded.
+        def fill() -> None:
+            while len(pending) < self.concurrency * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending.append(
+                    (chunk[0], self.pool.submit(self.process.read_bytes,
+                                                *chunk)))
+
+        try:
+            fill()
+            while pending:
+                address, future = pending.popleft()
+                data = future.result()
+                fill()
+                yield address, data
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    def read_all(self, regions: Iterable[Tuple[int, int]]
+                 ) -> List[Tuple[int, bytes]]:
+        return list(self.read(regions))
+
+    def read_stable(self, regions: Iterable[Tuple[int, int]], retries: int
+                    ) -> List[Tuple[int, bytes]]:
+        '''Like read_all, but every chunk is checked with stabilize().'''
+        return stabilize(self.process, self.read_all(regions), retries,
+                         self.pool)
+
+    def map(self, func: Callable[[T], R], values: Iterable[T]) -> Iterator[R]:
+        '''Runs func over values on the reader's threads, in order.'''
+        return self.pool.map(func, values)
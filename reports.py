@@ -0,0 +1,80 @@
+'''
+Summary tables in sop.db that are kept up to date at export time.
+
+Each export adds a snapshot. Only the new snapshot's rows are added to the
+summaries, so report queries over any number of snapshots just read these
+small tables instead of joining every effect instance to its item.
+'''
+
+
+def create_tables(conn) -> None:
+    conn.executescript('''
+    CREATE TABLE IF NOT EXISTS effect_histogram (
+        snapshot_id INTEGER NOT NULL,
+        slot_type TEXT NOT NULL,
+        effect_id INTEGER NOT NULL,
+        affinity_level INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (snapshot_id, slot_type, effect_id, affinity_level),
+        FOREIGN KEY (snapshot_id) REFERENCES snapshots (id),
+        FOREIGN KEY (effect_id) REFERENCES effects (id)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS best_item_per_effect (
+        snapshot_id INTEGER NOT NULL,
+        effect_id INTEGER NOT NULL,
+        slot_type TEXT NOT NULL,
+        owner_id INTEGER NOT NULL,
+        affinity_level INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        PRIMARY KEY (snapshot_id, effect_id, slot_type),
+        FOREIGN KEY (snapshot_id) REFERENCES snapshots (id),
+        FOREIGN KEY (effect_id) REFERENCES effects (id),
+        FOREIGN KEY (owner_id) REFERENCES item_instances (id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS best_item_per_effect_effect
+        ON best_item_per_effect (effect_id, snapshot_id);
+    ''')
+
+
+def refresh(conn, snapshot_id: int) -> None:
+    '''Adds the summary rows for one snapshot.'''
+    conn.execute('''
+    DELETE FROM effect_histogram WHERE snapshot_id = ?
+    ''', (snapshot_id,))
+    conn.execute('''
+    INSERT INTO effect_histogram (
+        snapshot_id, slot_type, effect_id, affinity_level, count
+    )
+    SELECT ii.snapshot_id, i.slot_type, ei.effect_id, ei.affinity_level,
+           COUNT(*)
+    FROM item_instances ii
+    JOIN items i ON i.id = ii.item_id
+    JOIN effect_instances ei ON ei.owner_id = ii.id
+    WHERE ii.snapshot_id = ?
+    GROUP BY i.slot_type, ei.effect_id, ei.affinity_level
+    ''', (snapshot_id,))
+
+    conn.execute('''
+    DELETE FROM best_item_per_effect WHERE snapshot_id = ?
+    ''', (snapshot_id,))
+    conn.execute('''
+    INSERT INTO best_item_per_effect (
+        snapshot_id, effect_id, slot_type, owner_id, affinity_level, amount
+    )
+    SELECT snapshot_id, effect_id, slot_type, owner_id, affinity_level, amount
+    FROM (
+        SELECT ii.snapshot_id, ei.effect_id, i.slot_type, ei.owner_id,
+               ei.affinity_level, ei.amount,
+               ROW_NUMBER() OVER (
+                   PARTITION BY ei.effect_id, i.slot_type
+                   ORDER BY ei.affinity_level DESC, ei.amount DESC,
+                            ei.owner_id
+               ) AS rank
+        FROM item_instances ii
+        JOIN items i ON i.id = ii.item_id
+        JOIN effect_instances ei ON ei.owner_id = ii.id
+        WHERE ii.snapshot_id = ?
+    )
+    WHERE rank = 1
+    ''', (snapshot_id,))
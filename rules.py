@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import configparser
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, ClassVar, Dict, Optional, Tuple, Union
+
+from config import Config
+
+if TYPE_CHECKING:
+    from memory import Effect, Item
+
+# Slot categories that the [Keep Artifacts] and [Minimum Affinity] sections
+# apply to. Accessories are never kept by these rules.
+SLOT_CATEGORIES = ('1-Hand Weapon', '2-Hand Weapon', 'Shield', '1-Slot Armour',
+                   '2-Slot Armour')
+
+
+@dataclass
+class Rules:
+    '''
+    The keeping criteria from config.ini, parsed once up front so that the
+    filter doesn't have to go through configparser for every item.
+    '''
+    # Lowercased effect name -> highest affinity level that is *not* kept.
+    effects: Dict[str, int]
+    # Slot category -> True, False or 'blessed'.
+    artifacts: Dict[str, Union[bool, str]]
+    min_affinity: Dict[str, int]
+    keep_weapon_skills: bool
+    keep_accessory_skills: bool
+    # How many items to keep for each skill, when keeping skills at all.
+    weapon_skill_count: int = 1
+    accessory_skill_count: int = 1
+    # 'level' or 'affinity'
+    skill_rank_by: str = 'level'
+    # How many of the best items to keep for each effect. 0 disables this.
+    effect_count: int = 0
+    # 'affinity' or 'level'
+    effect_rank_by: str = 'affinity'
+    # How many copies of the same item to keep, when removing duplicates.
+    duplicate_count: int = 1
+    # Lowercased effect name -> weight, for scoring.
+    weights: Dict[str, float] = field(default_factory=dict)
+    # 'amount' or 'affinity'
+    score_value: str = 'amount'
+    # How many of the highest scoring items to keep per slot type.
+    score_count: int = 0
+
+    _default: ClassVar[Optional[Rules]] = None
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> Rules:
+        effects = {name: config['Effects'].getint(name)
+                   for name in config['Effects']}
+
+        artifacts: Dict[str, Union[bool, str]] = {}
+        for slot_type in config['Keep Artifacts']:
+            try:
+                artifacts[slot_type] = config['Keep Artifacts'].getboolean(
+                    slot_type)
+            except ValueError:
+                artifacts[slot_type] = config['Keep Artifacts'][slot_type]
+
+        min_affinity = {slot_type: config['Minimum Affinity'].getint(slot_type)
+                        for slot_type in config['Minimum Affinity']}
+
+        weights = {}
+        if config.has_section('Weights'):
+            weights = {name: config['Weights'].getfloat(name)
+                       for name in config['Weights']}
+
+        skills = config['Skills']
+        return cls(effects, artifacts, min_affinity,
+                   skills.getboolean('Keep One Of Each Weapon Skill'),
+                   skills.getboolean('Keep One Of Each Accessory Skill'),
+                   skills.getint('Weapon Skill Count', fallback=1),
+                   skills.getint('Accessory Skill Count', fallback=1),
+                   skills.get('Rank By', fallback='level').lower(),
+                   config.getint('Best Per Effect', 'Count', fallback=0),
+                   config.get('Best Per Effect', 'Rank By',
+                              fallback='affinity').lower(),
+                   config.getint('Duplicates', 'Keep', fallback=1),
+                   weights,
+                   config.get('Scoring', 'Value', fallback='amount').lower(),
+                   config.getint('Scoring', 'Keep Per Slot', fallback=0))
+
+    @classmethod
+    def default(cls) -> Rules:
+        if cls._default is None:
+            cls._default = cls.from_config(Config)
+        return cls._default
+
+    @classmethod
+    def reload(cls) -> Rules:
+        Config.clear()
+        Config.read('config.ini')
+        cls._default = cls.from_config(Config)
+        return cls._default
+
+    def skill_rank(self, item: Item) -> Tuple[int, int]:
+        if self.skill_rank_by == 'affinity':
+            return (item.job1[1], item.level)
+        return (item.level, item.rarity)
+
+    def effect_rank(self, item: Item, effect: Effect) -> Tuple[int, int]:
+        if self.effect_rank_by == 'level':
+            return (item.level, effect.affinity_level)
+        return (effect.affinity_level, effect.raw_amount)
+
+    def effect_threshold(self, name: str) -> int:
+        return self.effects.get(name.lower(), -1)
+
+    def keep_artifacts(self, slot_type: str) -> Union[bool, str]:
+        return self.artifacts.get(slot_type.lower(), False)
+
+    def minimum_affinity(self, slot_type: str) -> int:
+        return self.min_affinity.get(slot_type.lower(), 9999)
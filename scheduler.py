@@ -0,0 +1,199 @@
+'''
+Paced writes to the game's memory.
+
+Writing thousands of statuses back to back makes the game stutter. A
+WriteScheduler stands in for the process handle: reads go straight through,
+but writes are queued and then written a slice at a time, with a pause after
+each slice so that the game gets most of every frame to itself.
+
+Each slice is capped by the [Writes] budgets, and is made smaller when writes
+start taking longer than usual. Writes bigger than Bytes Per Tick are split
+into pieces of that size when they're queued, so no slice goes over it.
+Progress is reported and cancellation is checked between slices, so a
+cancelled flush never leaves a slice half done.
+'''
+from __future__ import annotations
+
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import Config
+from process import write_many
+
+# Time from the start of one slice to the start of the next, and how much of
+# that can be spent writing, in seconds.
+TICK = Config.getfloat('Writes', 'Tick', fallback=16) / 1000
+BUDGET = Config.getfloat('Writes', 'Budget', fallback=4) / 1000
+WRITES_PER_TICK = Config.getint('Writes', 'Writes Per Tick', fallback=256)
+BYTES_PER_TICK = Config.getint('Writes', 'Bytes Per Tick', fallback=4096)
+
+# Size of the first slice, before anything is known about how long a write
+# takes.
+FIRST_SLICE = 16
+
+# Weight of the latest slice in the running average of the time per write.
+SMOOTHING = 0.25
+
+
+class WriteScheduler:
+    '''
+    Wraps a process handle (see process.py, or FakeProcess). Queued writes
+    aren't visible to reads through the scheduler until they've been flushed.
+    Only the last value queued for an address is written, except that the
+    bytes of an earlier, longer write that the last one doesn't cover are
+    kept.
+    '''
+
+    def __init__(self,
+                 process: Any,
+                 tick: float = TICK,
+                 budget: float = BUDGET,
+                 writes_per_tick: int = WRITES_PER_TICK,
+                 bytes_per_tick: int = BYTES_PER_TICK,
+                 progress: Optional[Callable[[int, int], None]] = None
+                 ) -> None:
+        '''
+        progress, if given, is called after every slice with the number of
+        writes done so far and the total number of writes queued.
+        '''
+        self.process = process
+        self.tick = tick
+        self.budget = budget
+        self.writes_per_tick = writes_per_tick
+        self.bytes_per_tick = bytes_per_tick
+        self.progress = progress
+
+        self.pending: Dict[int, bytes] = {}
+        self.written = 0
+        self.slices = 0
+        # Running average of the seconds each write takes.
+        self.write_time: Optional[float] = None
+        self._next_slice = 0.0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything other than writing goes straight to the process.
+        return getattr(self.process, name)
+
+    def __enter__(self) -> WriteScheduler:
+        return self
+
+    def __exit__(self, exc_type: Any, *_: Any) -> None:
+        # Don't carry on writing after an error or Ctrl+C.
+        if exc_type is None:
+            self.flush()
+
+    def write_bytes(self, address: int, value: bytes, length: int) -> None:
+        value = bytes(value[:length])
+        step = max(1, self.bytes_per_tick)
+        with self._lock:
+            for offset in range(0, len(value), step):
+                piece = value[offset:offset + step]
+                queued = self.pending.get(address + offset)
+                if queued is not None and len(queued) > len(piece):
+                    piece += queued[len(piece):]
+                self.pending[address + offset] = piece
+
+    def write_uint(self, address: int, value: int) -> None:
+        self.write_bytes(address, struct.pack('<I', value), 4)
+
+    def write_many(self, writes: Sequence[Tuple[int, bytes]]) -> None:
+        # Defined here so that process.write_many queues the writes, rather
+        # than finding the process's own write_many through __getattr__.
+        for address, data in writes:
+            self.write_bytes(address, data, len(data))
+
+    def slice_size(self) -> int:
+        '''How many writes the next slice will have, at most.'''
+        if self.write_time is None:
+            size = FIRST_SLICE
+        else:
+            size = int(self.budget / max(self.write_time, 1e-9))
+        return max(1, min(size, self.writes_per_tick))
+
+    @property
+    def ready(self) -> bool:
+        '''Whether there's enough queued for a full slice.'''
+        return len(self.pending) >= self.slice_size()
+
+    def cancel(self) -> None:
+        '''
+        Stops the flush in progress at the end of the current slice, and
+        drops everything that hasn't been written yet.
+        '''
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _take(self) -> List[Tuple[int, bytes]]:
+        size = self.slice_size()
+        taken = 0
+        batch = []
+        with self._lock:
+            for address in self.pending:
+                value = self.pending[address]
+                if batch and (len(batch) >= size
+                              or taken + len(value) > self.bytes_per_tick):
+                    break
+                batch.append((address, value))
+                taken += len(value)
+            for address, _ in batch:
+                del self.pending[address]
+        return batch
+
+    def run_slice(self) -> int:
+        '''
+        Waits until the next slice is due, then writes it. Returns the number
+        of writes made.
+        '''
+        if self._cancel.is_set():
+            with self._lock:
+                self.pending.clear()
+            return 0
+
+        delay = self._next_slice - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        batch = self._take()
+        if not batch:
+            return 0
+        start = time.perf_counter()
+        write_many(self.process, batch)
+        elapsed = time.perf_counter() - start
+
+        per_write = elapsed / len(batch)
+        if self.write_time is None:
+            self.write_time = per_write
+        else:
+            self.write_time += SMOOTHING * (per_write - self.write_time)
+
+        # Going over the budget pushes the next slice back by the overrun as
+        # well, to give the game time to catch up.
+        self._next_slice = start + self.tick + max(0.0, elapsed - self.budget)
+        self.written += len(batch)
+        self.slices += 1
+        if self.progress is not None:
+            self.progress(self.written, self.written + len(self.pending))
+        return len(batch)
+
+    def flush(self) -> bool:
+        '''
+        Writes everything queued. Returns False if it was cancelled before
+        everything was written.
+        '''
+        try:
+            while self.pending and not self._cancel.is_set():
+                self.run_slice()
+            if self._cancel.is_set():
+                with self._lock:
+                    self.pending.clear()
+                return False
+            return True
+        finally:
+            self._cancel.clear()
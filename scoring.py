@@ -0,0 +1,109 @@
+'''
+Weighted effect scores, and keeping the best scoring items of each slot type.
+
+The effects of every item make up a sparse items x effects matrix, stored as
+flat column/value lists with one row offset per item (at most Effect.COUNT
+entries per row). Every item's score is that matrix times the weight vector:
+the products are worked out in one map over the flat lists, and then summed
+per row.
+'''
+from __future__ import annotations
+
+import csv
+import itertools
+import math
+import operator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from database import Lookup
+from memory import Effect, Item
+from rules import Rules
+
+_EFFECTS = slice(Effect.FIRST, Effect.FIRST + Effect.COUNT * Effect.SIZE)
+
+
+class EffectMatrix:
+    '''The effects of a list of items, as a sparse matrix.'''
+
+    def __init__(self, items: Sequence[Item]) -> None:
+        self.items = items
+        # Row i is columns[rows[i]:rows[i + 1]], and the same for the values.
+        self.rows = [0]
+        self.columns: List[int] = []
+        self.amounts: List[int] = []
+        self.affinities: List[int] = []
+        for item in items:
+            for effect_id, raw_amount, affinity_level in (
+                    Effect.KEY_STRUCT.iter_unpack(
+                        memoryview(item._buffer)[_EFFECTS])):
+                if effect_id != 0:
+                    self.columns.append(effect_id)
+                    self.amounts.append(raw_amount)
+                    self.affinities.append(affinity_level)
+            self.rows.append(len(self.columns))
+
+    def dot(self, weights: Dict[int, float], value: str = 'amount') -> List[float]:
+        '''Every item's sum of effect value times the effect's weight.'''
+        values = self.affinities if value == 'affinity' else self.amounts
+        products = list(map(operator.mul, values,
+                            map(weights.get, self.columns,
+                                itertools.repeat(0.0))))
+        return [math.fsum(products[start:end])
+                for start, end in zip(self.rows, self.rows[1:])]
+
+
+def effect_weights(rules: Rules) -> Dict[int, float]:
+    '''The [Weights] section, by effect id instead of name.'''
+    return {effect_id: rules.weights[name.lower()]
+            for effect_id, name in Lookup.effect_strings.items()
+            if name.lower() in rules.weights}
+
+
+@dataclass
+class Score:
+    item: Item
+    slot_type: str
+    score: float
+    # 1 for the best item of its slot type, 2 for the next, and so on.
+    rank: int = 0
+
+
+def score(items: Sequence[Item], rules: Optional[Rules] = None) -> List[Score]:
+    '''Scores every item that goes in a slot, ranked within its slot type.'''
+    if rules is None:
+        rules = Rules.default()
+    items = [item for item in items if Lookup.item_slots.get(item.item_id)]
+    scores = EffectMatrix(items).dot(effect_weights(rules), rules.score_value)
+    results = [Score(item, Lookup.item_slots[item.item_id], value)
+               for item, value in zip(items, scores)]
+
+    # sorted() is stable, so equal scores rank the earlier item first, like
+    # TopK does.
+    ordered = sorted(results, key=lambda s: (s.slot_type, -s.score))
+    for _, group in itertools.groupby(ordered, key=lambda s: s.slot_type):
+        for rank, entry in enumerate(group, 1):
+            entry.rank = rank
+    return results
+
+
+def best_scores(scores: Sequence[Score], count: int) -> List[Item]:
+    '''The `count` highest scoring items of each slot type.'''
+    return [entry.item for entry in scores
+            if entry.rank <= count and entry.score > 0]
+
+
+def to_csv(scores: Sequence[Score], filename: Path,
+           kept: Sequence[Item] = ()) -> None:
+    kept_ids = set(map(id, kept))
+    with filename.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['slot type', 'rank', 'score', 'item', 'level',
+                         'effects', 'kept'])
+        for entry in sorted(scores, key=lambda s: (s.slot_type, s.rank)):
+            item = entry.item
+            writer.writerow([entry.slot_type, entry.rank, f'{entry.score:g}',
+                             item.name, item.level,
+                             '; '.join(map(repr, item.effects)),
+                             'yes' if id(item) in kept_ids else ''])
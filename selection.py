@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+from collections import defaultdict
+from typing import Any, Dict, Generic, Hashable, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class TopK(Generic[T]):
+    '''
+    Keeps the K highest ranked values seen for each key, using one bounded
+    min-heap per key. Values are pushed one at a time, so a whole inventory
+    can be ranked in a single pass without sorting each group.
+
+    Ties are broken in favour of whichever value was pushed first.
+    '''
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self.heaps: Dict[Hashable, List[Tuple[Any, int, T]]] = defaultdict(list)
+        self._order = itertools.count()
+
+    def __bool__(self) -> bool:
+        return self.k > 0
+
+    def push(self, key: Hashable, rank: Any, value: T) -> None:
+        if self.k <= 0:
+            return
+        heap = self.heaps[key]
+        entry = (rank, -next(self._order), value)
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def best(self, key: Hashable, n: int) -> List[T]:
+        if n <= 0:
+            return []
+        heap = self.heaps.get(key, [])
+        return [value for *_, value in heapq.nlargest(
+            n, heap, key=lambda entry: entry[:2])]
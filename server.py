@@ -0,0 +1,257 @@
+'''
+Resident server mode.
+
+Attaches to the game and loads the game databases and config once, then
+answers JSON-RPC 2.0 requests over a local TCP socket. Each request is a
+single line of JSON, and each response is written back as a single line.
+
+Use client.py to send requests without paying for the database loading.
+'''
+from __future__ import annotations
+
+import inspect
+import ipaddress
+import json
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+from config import Config
+from decisions import DecisionCache
+from journal import Journal
+from memory import Inventory, Item
+from process import Process, open_process
+from rules import Rules
+from scheduler import WriteScheduler
+import sop
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def item_summary(item: Item) -> Dict[str, Any]:
+    return {
+        'address': item._address,
+        'item_id': item.item_id,
+        'name': item.name,
+        'type': item.type,
+        'level': item.level,
+        'rarity': item.rarity,
+        'locked': item.locked,
+        'markers': list(item.get_markers()),
+        'effects': [repr(effect) for effect in item.effects],
+    }
+
+
+class Session:
+    '''
+    Everything that is expensive to set up: the process handle and the
+    compiled rules. Requests are handled one at a time, since they all poke
+    at the same game memory.
+    '''
+
+    def __init__(self, pm: Optional[Process] = None) -> None:
+        # Writes are queued up and written a slice at a time once each
+        # request is done with them.
+        self.pm = WriteScheduler(pm if pm is not None
+                                 else open_process())
+        self.rules = Rules.default()
+        self.cache = DecisionCache.load(Path('decisions.json'))
+        self.lock = threading.Lock()
+        self.methods: Dict[str, Callable[..., Any]] = {
+            'ping': self.ping,
+            'filter': self.filter,
+            'upgrades': self.upgrades,
+            'unlock_all': self.unlock_all,
+            'clear_markers': self.clear_markers,
+            'listing': self.listing,
+            'query': self.query,
+            'reload_config': self.reload_config,
+            'undo': self.undo,
+        }
+
+    def inventory(self) -> Inventory:
+        return Inventory.from_process(self.pm)
+
+    def dispatch(self, method: str, params: Any) -> Any:
+        if method == 'cancel':
+            # Doesn't wait for the lock, so that it can stop the writes of a
+            # request that is still running.
+            return self.cancel()
+        func = self.methods.get(method)
+        if func is None:
+            raise RPCError(METHOD_NOT_FOUND, f'Unknown method: {method}')
+        # Only a mismatch with the method's parameters is the caller's fault;
+        # a TypeError from inside the method is a bug like any other error.
+        try:
+            if isinstance(params, dict):
+                bound = inspect.signature(func).bind(**params)
+            else:
+                bound = inspect.signature(func).bind(*(params or []))
+        except TypeError as e:
+            raise RPCError(INVALID_PARAMS, str(e))
+        with self.lock:
+            result = func(*bound.args, **bound.kwargs)
+            if not self.pm.flush():
+                raise RPCError(SERVER_ERROR, 'Cancelled. Use undo to restore '
+                               'the statuses that were already written.')
+            return result
+
+    def ping(self) -> str:
+        return 'pong'
+
+    def cancel(self) -> bool:
+        if not self.pm.pending:
+            return False
+        self.pm.cancel()
+        return True
+
+    def filter(self, cover: bool = False, dedupe: bool = False,
+               score: bool = False) -> Dict[str, int]:
+        inv = self.inventory()
+        self.cache.reset_counts()
+        kept = sop.mark_filtered(inv, self.rules, self.cache, cover, dedupe,
+                                 score)
+        # The cover doesn't use the cache, and saving it would throw away
+        # the decisions from the last run.
+        if not cover:
+            self.cache.save()
+        return {'items': len(inv.items), 'kept': len(kept),
+                'reused': self.cache.reused}
+
+    def upgrades(self) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        results = sop.find_upgrades(self.inventory())
+        return {
+            upgrade_item: {
+                effect: [dict(item_summary(item), upgrade=repr(item_eff))
+                         for item, item_eff in items]
+                for effect, items in effects.items()
+            }
+            for upgrade_item, effects in results.items()
+        }
+
+    def unlock_all(self) -> int:
+        inv = self.inventory()
+        sop.unlock_items(inv)
+        return len(inv.items)
+
+    def clear_markers(self, marker: Optional[int] = None) -> int:
+        inv = self.inventory()
+        sop.clear_item_markers(inv, marker)
+        return len(inv.items)
+
+    def listing(self) -> Dict[str, Dict[int, int]]:
+        return sop.listing(self.inventory())
+
+    def query(self,
+              item_id: Optional[int] = None,
+              name: Optional[str] = None,
+              effect: Optional[str] = None,
+              marker: Optional[int] = None,
+              locked: Optional[bool] = None) -> List[Dict[str, Any]]:
+        results = []
+        for item in self.inventory().items:
+            if item_id is not None and item.item_id != item_id:
+                continue
+            if name is not None and name.lower() not in item.name.lower():
+                continue
+            if effect is not None and not any(
+                    effect.lower() in eff.name.lower() for eff in item.effects):
+                continue
+            if marker is not None and marker not in item.get_markers():
+                continue
+            if locked is not None and item.locked != locked:
+                continue
+            results.append(item_summary(item))
+        return results
+
+    def undo(self) -> Dict[str, int]:
+        restored, skipped = Journal.load().restore(self.pm)
+        return {'restored': restored, 'skipped': skipped}
+
+    def reload_config(self) -> bool:
+        self.rules = Rules.reload()
+        return True
+
+    def handle(self, line: bytes) -> Optional[Dict[str, Any]]:
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise RPCError(PARSE_ERROR, str(e))
+            if not isinstance(request, dict) or 'method' not in request:
+                raise RPCError(INVALID_REQUEST, 'Invalid request')
+            request_id = request.get('id')
+            result = self.dispatch(request['method'], request.get('params'))
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        except RPCError as e:
+            response = {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': e.code, 'message': e.message}}
+        except Exception as e:
+            response = {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': SERVER_ERROR, 'message': str(e)}}
+        return response
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    server: Server
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.session.handle(line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+def is_loopback(host: str) -> bool:
+    '''Whether every address the host name resolves to is on this machine.'''
+    try:
+        addresses = socket.getaddrinfo(host, None, socket.AF_INET,
+                                       socket.SOCK_STREAM)
+    except socket.gaierror:
+        return False
+    return bool(addresses) and all(
+        ipaddress.ip_address(address[4][0]).is_loopback
+        for address in addresses)
+
+
+class Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, session: Session, host: str, port: int) -> None:
+        super().__init__((host, port), RequestHandler)
+        self.session = session
+
+
+def serve(host: Optional[str] = None, port: Optional[int] = None) -> None:
+    host = host or Config.get('Server', 'Host', fallback='127.0.0.1')
+    port = port or Config.getint('Server', 'Port', fallback=47800)
+    # Anyone who can connect can rewrite the game's memory, so don't listen
+    # anywhere but this machine.
+    if not is_loopback(host):
+        raise ValueError(f'Refusing to listen on {host}: [Server] Host must '
+                         'be a loopback address, like 127.0.0.1.')
+    session = Session()
+    with Server(session, host, port) as server:
+        print(f'Listening on {host}:{port}. Press Ctrl+C to stop.')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -1,10 +1,25 @@
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from memory import Inventory, Item, Effect
 from collections import defaultdict
 from database import Database, Strings, ItemsDB
+from rules import Rules
+from decisions import DecisionCache
+from pipeline import filter_streaming
+from journal import Journal
+from explain import Explanation
+from scheduler import WriteScheduler
+from process import open_process
+from analysis import RecordMatrix
+import analysis
+from optimizer import Objective
+import optimizer
+from sweep import Axis
+import sweep as sweeping
+import scoring
 from pathlib import Path
 import csv
 import sqlite3
+import reports
 import click
 
 
@@ -17,9 +32,10 @@ def diff(a: str, b: str) -> str:
             result.append('\033[31m' + bc + '\033[39m')
     return ''.join(result)
 
-def listing() -> None:
+def listing(inv: Optional[Inventory] = None) -> Dict[str, Dict[int, int]]:
     effects = defaultdict(lambda: defaultdict(int))
-    inv = Inventory.from_process()
+    if inv is None:
+        inv = Inventory.from_process()
     for item in inv.items:
         if item.item_id == 0 or 'Accessory' in ItemsDB[item.item_id].slots:
             continue
@@ -31,6 +47,7 @@ def listing() -> None:
         for effect, levels in sorted(effects.items()):
             row = [effect] + [levels.get(level, 0) for level in range(10)]
             writer.writerow(row)
+    return effects
             
 def create_db(inventory):
     conn = sqlite3.connect('sop.db')
@@ -40,41 +57,75 @@ def create_db(inventory):
             Effect.create_table(conn)
             Strings.create_table(conn)
             Database.populate(conn)
-            
+            reports.create_tables(conn)
+
+            snapshot_id = conn.execute('''
+                INSERT INTO snapshots (taken_at) VALUES (datetime('now'))
+            ''').lastrowid
             for item in inventory.items:
-                item.insert_row(conn)
+                item.insert_row(conn, snapshot_id)
+
+            reports.refresh(conn, snapshot_id)
+        conn.execute('PRAGMA optimize')
     finally:
         conn.close()
         
-@click.group()
-def main():
-    pass
-        
-@main.command()
-def unlock_all() -> None:
-    print('Unlocking all items.')
-    inv = Inventory.from_process()
+
+def show_progress(written: int, total: int) -> None:
+    print(f'\rWriting statuses: {written}/{total}', end='', flush=True)
+    if written == total:
+        print()
+
+
+def print_explanation(explain: Explanation, rules: Rules) -> None:
+    print(f'{"Rule":10} {"Checked":>8} {"Kept":>8} {"Total ms":>9} '
+          f'{"us/check":>9}')
+    for rule, stats in explain.rules.items():
+        per_check = (stats.seconds / stats.evaluated * 1e6
+                     if stats.evaluated else 0.0)
+        print(f'{rule:10} {stats.evaluated:8} {stats.hits:8} '
+              f'{stats.seconds * 1000:9.2f} {per_check:9.2f}')
+
+    print('\nConfig lines that kept the most items:')
+    for (section, key), count in explain.lines.most_common(10):
+        print(f'  [{section}] {key}: {count}')
+    unused = explain.unused_lines(rules)
+    if unused:
+        print('\nConfig lines that didn\'t keep anything:')
+        for section, key in unused:
+            print(f'  [{section}] {key}')
+
+
+def paced_process() -> WriteScheduler:
+    '''The game, with writes paced by the [Writes] settings in config.ini.'''
+    return WriteScheduler(open_process(), progress=show_progress)
+
+
+def save_journal(items: Iterable[Item]) -> None:
+    '''Saves the items' current statuses, so that `undo` can restore them.'''
+    items = list(items)
+    process = next((item._process for item in items if item._process), None)
+    if process is not None:
+        Journal.for_process(process).record_all(items).save()
+
+
+def unlock_items(inv: Inventory) -> None:
+    save_journal(inv.items)
     for item in inv.items:
         item.locked = False
-        
-@main.command()
-@click.argument('marker', required=False, default=None)
-def clear_markers(marker: Optional[int]) -> None:
-    inv = Inventory.from_process()
+
+
+def clear_item_markers(inv: Inventory, marker: Optional[int] = None) -> None:
+    save_journal(inv.items)
     if marker is None:
-        print('Clearing all markers.')    
         for item in inv.items:        
             item.clear_markers()
     else:
-        print(f'Clearing all marker #{marker}.')
         for item in inv.items:
             item.unset_marker(int(marker))
-        
-@main.command()
-def upgrades() -> None:   
-    inv = Inventory.from_process()#Inventory.from_file(Path('inv.bin'))
-    statuses = defaultdict(list)
-    
+
+
+def find_upgrades(inv: Inventory) -> Dict[str, Dict[str, List[Tuple[Item, Effect]]]]:
     item_types = defaultdict(list)
     upgrade = []
 
@@ -106,13 +157,78 @@ def upgrades() -> None:
     results = defaultdict(lambda: defaultdict(list))
     for upgrade_item, upgrade_eff, item, item_eff in possible_upgrades:
         results[f'{upgrade_item.name} (lvl{upgrade_item.level})'][repr(upgrade_eff)].append((item, item_eff))
+
+    for effects in results.values():
+        for items in effects.values():
+            items.sort(key=lambda i: repr(i[1]), reverse=True)
+
+    save_journal(item for _, _, item, _ in possible_upgrades)
+    for _, _, item, _ in possible_upgrades:
+        item.set_marker(Item.OUTPUT_MARKER)
+
+    return results
+
+
+def mark_filtered(inv: Inventory,
+                  rules: Optional[Rules] = None,
+                  cache: Optional[DecisionCache] = None,
+                  cover: bool = False,
+                  dedupe: bool = False,
+                  score: bool = False,
+                  explain: Optional[Explanation] = None) -> List[Item]:
+    save_journal(inv.items)
+    for item in inv.items:
+        item.set_marker(Item.OUTPUT_MARKER)
+
+    if cover:
+        kept = inv.cover(rules)
+    elif dedupe:
+        kept = inv.dedupe(rules, cache)
+    else:
+        kept = inv.filter(rules, cache, explain)
+    if score:
+        if rules is None:
+            rules = Rules.default()
+        kept_ids = set(map(id, kept))
+        kept.extend(item for item in scoring.best_scores(
+                        scoring.score(inv.items, rules), rules.score_count)
+                    if id(item) not in kept_ids)
+    for item in kept:
+        item.unset_marker(Item.OUTPUT_MARKER)
+    return kept
+
+        
+@click.group()
+def main():
+    pass
+        
+@main.command()
+def unlock_all() -> None:
+    print('Unlocking all items.')
+    with paced_process() as pm:
+        unlock_items(Inventory.from_process(pm))
+        
+@main.command()
+@click.argument('marker', required=False, default=None)
+def clear_markers(marker: Optional[int]) -> None:
+    if marker is None:
+        print('Clearing all markers.')    
+    else:
+        print(f'Clearing all marker #{marker}.')
+    with paced_process() as pm:
+        clear_item_markers(Inventory.from_process(pm), marker)
+        
+@main.command()
+def upgrades() -> None:   
+    with paced_process() as pm:
+        inv = Inventory.from_process(pm)#Inventory.from_file(Path('inv.bin'))
+        results = find_upgrades(inv)
         
     for upgrade_item, effects in results.items():
         print(upgrade_item)
         for effect, items in effects.items():
             print('--', effect)
-            for item, item_eff in sorted(items, key=lambda i: repr(i[1]), reverse=True):
-                item.set_marker(Item.OUTPUT_MARKER)
+            for item, item_eff in items:
                 print(f'---- {item.name} (lvl{item.level}) - {repr(item_eff)}')
                 
     #for upgrade_item, upgrade_eff, item, item_eff in possible_upgrades:
@@ -121,7 +237,199 @@ def upgrades() -> None:
 
 
 @main.command()
-def filter_inventory() -> None:   
+@click.argument('snapshots', nargs=-1,
+                type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option('--output', default='analysis.csv', show_default=True,
+              type=click.Path(dir_okay=False, path_type=Path))
+def analyze(snapshots: Tuple[Path, ...], output: Path) -> None:
+    '''
+    Byte statistics for every offset of the item structure, across one or
+    more saved inv.bin snapshots (or the running game if none are given).
+    '''
+    if snapshots:
+        matrices = [RecordMatrix.from_snapshot(path) for path in snapshots]
+    else:
+        matrices = [RecordMatrix.from_inventory(Inventory.from_process())]
+    results = analysis.analyze(matrices)
+    analysis.to_csv(results, output)
+
+    print(f'Analyzed {sum(m.rows for m in matrices)} records from '
+          f'{len(matrices)} snapshot(s). Results written to {output}.')
+    print('Unknown offsets most correlated with a known field:')
+    unknown = [stats for stats in results
+               if 'unknown' in analysis.field_name(stats.offset)
+               or not analysis.field_name(stats.offset)]
+    best = sorted(
+        ((abs(value), name, stats) for stats in unknown
+         for name, value in stats.correlations.items() if value is not None),
+        key=lambda x: x[0], reverse=True)[:10]
+    for value, name, stats in best:
+        print(f'  0x{stats.offset:03X} {analysis.field_name(stats.offset):24}'
+              f' {name}: {stats.correlations[name]:+.3f}')
+
+
+@main.command()
+@click.option('--weight', 'weights', multiple=True, required=True,
+              metavar='EFFECT=WEIGHT',
+              help='Score per point of an effect. Can be repeated.')
+@click.option('--require', 'required', multiple=True, metavar='EFFECT[=LEVEL]',
+              help='An effect the loadout must have, optionally with a '
+              'minimum affinity level. Can be repeated.')
+@click.option('--job', default=None, help='Job to count affinity towards.')
+@click.option('--min-affinity', default=0, show_default=True,
+              help='Minimum total affinity for --job.')
+@click.option('--mark', is_flag=True,
+              help='Mark the chosen items with the output marker.')
+def optimize(weights: Tuple[str, ...], required: Tuple[str, ...],
+             job: Optional[str], min_affinity: int, mark: bool) -> None:
+    '''Finds the owned gear with the best weighted sum of effects.'''
+    objective = Objective.parse(weights, required, job, min_affinity)
+    inv = Inventory.from_process()
+    loadout = optimizer.optimize(inv.items, objective)
+    if loadout is None:
+        print('No combination of items meets the requirements.')
+        return
+
+    print(f'Score: {loadout.score:g} ({loadout.searched} partial loadouts '
+          'searched)')
+    if mark:
+        save_journal(loadout.items)
+    for item in loadout.items:
+        print(f'-- {item.type}: {item.name} (lvl{item.level})')
+        for effect in item.effects:
+            print(f'---- {repr(effect)}')
+        if mark:
+            item.set_marker(Item.OUTPUT_MARKER)
+
+
+@main.command()
+@click.option('--effect', 'effects', multiple=True,
+              metavar='EFFECT=LEVEL,...',
+              help='[Effects] thresholds to try. Can be repeated.')
+@click.option('--min-affinity', 'min_affinity', multiple=True,
+              metavar='SLOT=AFFINITY,...',
+              help='[Minimum Affinity] values to try. Can be repeated.')
+@click.option('--artifacts', multiple=True, metavar='SLOT=yes|no|blessed,...',
+              help='[Keep Artifacts] values to try. Can be repeated.')
+@click.option('--snapshot', default=None,
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='Use a saved inv.bin instead of the running game.')
+@click.option('--output', default='sweep.csv', show_default=True,
+              type=click.Path(dir_okay=False, path_type=Path))
+def sweep(effects: Tuple[str, ...], min_affinity: Tuple[str, ...],
+          artifacts: Tuple[str, ...], snapshot: Optional[Path],
+          output: Path) -> None:
+    '''
+    Compares how many items every combination of the given config.ini values
+    would keep, by slot type and reason.
+    '''
+    try:
+        axes = ([Axis.parse('Effects', spec) for spec in effects] +
+                [Axis.parse('Minimum Affinity', spec) for spec in min_affinity] +
+                [Axis.parse('Keep Artifacts', spec) for spec in artifacts])
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    if snapshot is not None:
+        inv = Inventory.from_file(snapshot)
+    else:
+        inv = Inventory.from_process()
+    result = sweeping.sweep(inv.items, Rules.default(), axes)
+    sweeping.to_csv(result, output)
+
+    slots = result.slots()
+    header = ([axis.name for axis in axes] + ['Kept'] +
+              [reason.title() for reason in sweeping.REASONS] + slots)
+    rows = []
+    for variant in range(len(result.counts)):
+        by_reason = result.by_reason(variant)
+        by_slot = result.by_slot(variant)
+        rows.append(result.values(variant) +
+                    [str(result.kept(variant))] +
+                    [str(by_reason[reason]) for reason in sweeping.REASONS] +
+                    [str(by_slot.get(slot, 0)) for slot in slots])
+    widths = [max(len(row[i]) for row in [header] + rows)
+              for i in range(len(header))]
+    for row in [header] + rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+    print(f'\n{len(inv.items)} items, {len(rows)} variants. Details written '
+          f'to {output}.')
+
+
+@main.command()
+@click.option('--snapshot', default=None,
+              type=click.Path(exists=True, dir_okay=False, path_type=Path),
+              help='Use a saved inv.bin instead of the running game.')
+@click.option('--output', default='scores.csv', show_default=True,
+              type=click.Path(dir_okay=False, path_type=Path))
+def scores(snapshot: Optional[Path], output: Path) -> None:
+    '''Scores every item with the [Weights] from config.ini.'''
+    if snapshot is not None:
+        inv = Inventory.from_file(snapshot)
+    else:
+        inv = Inventory.from_process()
+    rules = Rules.default()
+    results = scoring.score(inv.items, rules)
+    kept = scoring.best_scores(results, rules.score_count)
+    scoring.to_csv(results, output, kept)
+
+    kept_ids = set(map(id, kept))
+    for entry in sorted(results, key=lambda s: (s.slot_type, s.rank)):
+        if id(entry.item) in kept_ids:
+            print(f'{entry.slot_type} #{entry.rank}: {entry.item.name} '
+                  f'(lvl{entry.item.level}) - {entry.score:g}')
+    print(f'Scored {len(results)} items. Results written to {output}.')
+
+
+@main.command()
+def undo() -> None:
+    '''Restores the statuses from before the last command that changed them.'''
+    journal = Journal.load()
+    print(f'Restoring {len(journal.entries)} item statuses.')
+    with paced_process() as pm:
+        restored, skipped = journal.restore(pm)
+    print(f'Restored {restored} items.')
+    if skipped:
+        print(f'Skipped {skipped} slots that now hold a different item.')
+
+
+@main.command()
+def serve() -> None:
+    import server
+    try:
+        server.serve()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+
+@main.command()
+@click.option('--stream', is_flag=True,
+              help='Write statuses while the inventory is still being read. '
+              'Skips saving inv.bin and sop.db.')
+@click.option('--cover', is_flag=True,
+              help='Keep a minimal set of items that covers every skill and '
+              'every effect, instead of every item over an effect threshold.')
+@click.option('--dedupe', is_flag=True,
+              help='Only keep a few copies of items that are the same item at '
+              'the same level with the same effects. See [Duplicates].')
+@click.option('--score', is_flag=True,
+              help='Also keep the highest scoring items of each slot type. '
+              'See [Scoring].')
+@click.option('--explain', 'explain_rules', is_flag=True,
+              help='Show which rules kept items and how long each took, and '
+              'write the reason for every kept item to explain.csv.')
+def filter_inventory(stream: bool, cover: bool, dedupe: bool,
+                     score: bool, explain_rules: bool) -> None:   
+    if stream + cover + dedupe > 1:
+        raise click.UsageError(
+            'Only one of --stream, --cover and --dedupe can be used.')
+    if stream and score:
+        raise click.UsageError('--stream and --score can\'t be combined.')
+    # Those modes drop or add items after the rules have been checked, so
+    # the explanation wouldn't match what's kept.
+    if explain_rules and (stream or cover or dedupe or score):
+        raise click.UsageError('--explain can\'t be combined with --stream, '
+                               '--cover, --dedupe or --score.')
     
     print('''
 Please ensure that Stranger of Paradise: Final Fantasy Origin is running and you have loaded your save.
@@ -137,17 +445,37 @@ Please ensure that Stranger of Paradise: Final Fantasy Origin is running and you
         print('\nCancelled.')
         return
 
-    inv = Inventory.from_process()
-    #inv = Inventory.from_file(Path('inv.bin'))
-    
-    for item in inv.items:
-        item.set_marker(Item.OUTPUT_MARKER)
-    
-    for item in inv.filter():
-        item.unset_marker(Item.OUTPUT_MARKER)
+    cache = DecisionCache.load(Path('decisions.json'))
+    explain = Explanation() if explain_rules else None
+    if stream:
+        pm = open_process()
+        journal = Journal.for_process(pm)
+        try:
+            filter_streaming(pm, cache=cache, journal=journal)
+        finally:
+            journal.save()
+    else:
+        with paced_process() as pm:
+            inv = Inventory.from_process(pm)
+            #inv = Inventory.from_file(Path('inv.bin'))
+            mark_filtered(inv, cache=cache, cover=cover, dedupe=dedupe,
+                          score=score, explain=explain)
+    # --explain and --cover don't use the cache, so there's nothing new to
+    # save, and saving would throw away the decisions from the last run.
+    if explain is None and not cover:
+        cache.save()
+        print(f'Reused {cache.reused} of {cache.reused + cache.evaluated} '
+              'keep decisions from the previous run.')
         
-    inv.save(Path('inv.bin'))
-    create_db(inv)
+    if not stream:
+        inv.save(Path('inv.bin'))
+        create_db(inv)
+
+    if explain is not None:
+        print()
+        print_explanation(explain, Rules.default())
+        explain.to_csv(Path('explain.csv'))
+        print('The rule that kept each item was written to explain.csv.\n')
 
     print('You can now dismantle all unlocked items from within the game.')
     input('(done)')
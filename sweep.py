@@ -0,0 +1,291 @@
+'''
+Counts how many items each of many variations of the config.ini rules would
+keep, without running the filter once per variation.
+
+Every variant gets one bit of an int. For each item, each varied setting is
+checked once per distinct value, and the bits of the variants using the
+values that keep the item are OR'd together, so an item is decided for all
+variants at once. Items with the same slot type, reason and variant mask are
+then counted together.
+'''
+from __future__ import annotations
+
+import configparser
+import csv
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from database import ItemsDB
+from memory import Item
+from rules import Rules
+
+# Why an item is kept, in the order the filter checks them. An item is only
+# counted under the first reason that applies.
+REASONS = ('effect', 'artifact', 'blessed', 'affinity', 'skill', 'best')
+
+@dataclass
+class Axis:
+    '''One setting to vary, and the values to try for it.'''
+    section: str
+    name: str
+    values: List[Any]
+    # masks[i] has a bit set for every variant that uses values[i].
+    masks: List[int] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, section: str, spec: str) -> Axis:
+        '''Parses NAME=VALUE,VALUE,... for a config.ini section.'''
+        name, _, values = spec.rpartition('=')
+        if not name or not values:
+            raise ValueError(f'Expected NAME=VALUE,... but got {spec!r}')
+        parsed: List[Any] = []
+        for value in values.split(','):
+            value = value.strip().lower()
+            if section != 'Keep Artifacts':
+                parsed.append(int(value))
+            elif value == 'blessed':
+                parsed.append(value)
+            elif value in configparser.ConfigParser.BOOLEAN_STATES:
+                parsed.append(configparser.ConfigParser.BOOLEAN_STATES[value])
+            else:
+                raise ValueError(f'Not a [Keep Artifacts] value: {value!r}')
+        return cls(section, name.strip(), parsed)
+
+
+@dataclass
+class SweepResult:
+    axes: List[Axis]
+    # One Counter per variant, of (slot type, reason) -> items kept.
+    counts: List[Counter]
+
+    def values(self, variant: int) -> List[str]:
+        '''A variant's value for each axis, as it would be in config.ini.'''
+        values = []
+        for axis in self.axes:
+            value = next(value for value, mask in zip(axis.values, axis.masks)
+                         if mask >> variant & 1)
+            if isinstance(value, bool):
+                value = 'yes' if value else 'no'
+            values.append(str(value))
+        return values
+
+    def kept(self, variant: int) -> int:
+        return sum(self.counts[variant].values())
+
+    def by_reason(self, variant: int) -> Dict[str, int]:
+        totals = dict.fromkeys(REASONS, 0)
+        for (_, reason), count in self.counts[variant].items():
+            totals[reason] += count
+        return totals
+
+    def by_slot(self, variant: int) -> Dict[str, int]:
+        totals: Dict[str, int] = defaultdict(int)
+        for (slot, _), count in self.counts[variant].items():
+            totals[slot] += count
+        return totals
+
+    def slots(self) -> List[str]:
+        return sorted({slot for counts in self.counts for slot, _ in counts})
+
+
+class Grid:
+    '''Every combination of the values of each axis, on top of some rules.'''
+
+    def __init__(self, rules: Rules, axes: Sequence[Axis]) -> None:
+        self.rules = rules
+        self.axes = list(axes)
+        self._by_key = {(axis.section, axis.key): axis for axis in self.axes}
+
+        self.count = 1
+        for axis in self.axes:
+            self.count *= len(axis.values)
+        self.all = (1 << self.count) - 1
+
+        # The first axis changes slowest from one variant to the next.
+        stride = self.count
+        for axis in self.axes:
+            stride //= len(axis.values)
+            axis.masks = [0] * len(axis.values)
+            for variant in range(self.count):
+                axis.masks[variant // stride % len(axis.values)] |= 1 << variant
+
+    def _mask(self, section: str, key: str, default: Any,
+              keeps: Callable[[Any], bool]) -> int:
+        '''Variants whose value for the setting would keep the item.'''
+        axis = self._by_key.get((section, key))
+        if axis is None:
+            return self.all if keeps(default) else 0
+        mask = 0
+        for value, variants in zip(axis.values, axis.masks):
+            if keeps(value):
+                mask |= variants
+        return mask
+
+    def effect_mask(self, item: Item) -> int:
+        mask = 0
+        for effect in item.effects:
+            key = effect.name.lower()
+            level = effect.affinity_level
+            mask |= self._mask('Effects', key, self.rules.effect_threshold(key),
+                               lambda threshold: threshold < level)
+        return mask
+
+    def artifact_mask(self, item: Item, slot_type: str) -> int:
+        '''Variants that keep the item as an artifact.'''
+        key = slot_type.lower()
+        is_artifact = item.job1[0] != 0 and item.job2[0] != 0
+        return self._mask('Keep Artifacts', key,
+                          self.rules.keep_artifacts(key),
+                          lambda value: value is True and is_artifact)
+
+    def blessed_mask(self, item: Item, slot_type: str) -> int:
+        '''Variants that keep the item as a blessed artifact.'''
+        key = slot_type.lower()
+        is_blessed = item.summon[0] != 0
+        return self._mask('Keep Artifacts', key,
+                          self.rules.keep_artifacts(key),
+                          lambda value: value == 'blessed' and is_blessed)
+
+    def affinity_mask(self, item: Item, slot_type: str) -> int:
+        key = slot_type.lower()
+        return self._mask('Minimum Affinity', key,
+                          self.rules.minimum_affinity(key),
+                          lambda minimum: item.job1[1] >= minimum)
+
+
+def _top_up(entries: List[Tuple[Any, int, int]], k: int,
+            all_variants: int) -> List[Tuple[int, int]]:
+    '''
+    The (item index, variants) picked to bring one skill or effect group up to
+    k items in every variant, like ItemFilter.finish does for a single one.
+
+    need[j] holds the variants that still need more than j items, so taking
+    one item for a set of variants is a shift of those bits down the list.
+    Each need[j + 1] is a subset of need[j], so the shift can stop at the
+    first empty one.
+    '''
+    need = [all_variants] * k + [0]
+
+    def take(variants: int) -> None:
+        for j in range(k):
+            if not need[j]:
+                break
+            need[j] = (need[j] & ~variants) | (need[j + 1] & variants)
+
+    for _, _, kept in entries:
+        if kept:
+            take(kept)
+
+    picked = []
+    picked_for: Dict[int, int] = defaultdict(int)
+    # An item with the same skill twice counts twice, like a kept one does.
+    entry_count = Counter(index for _, index, _ in entries)
+    # sorted() is stable, so equal ranks keep the earlier item, like TopK.
+    for _, index, kept in sorted(entries, key=lambda e: e[0], reverse=True):
+        variants = need[0] & ~kept & ~picked_for[index]
+        if variants:
+            picked.append((index, variants))
+            picked_for[index] |= variants
+            for _ in range(entry_count[index]):
+                take(variants)
+    return picked
+
+
+def sweep(items: Sequence[Item], rules: Rules,
+          axes: Sequence[Axis]) -> SweepResult:
+    grid = Grid(rules, axes)
+
+    slots: List[Optional[str]] = []
+    reasons: List[Dict[str, int]] = []
+    groups: Dict[Tuple[str, int], List[Tuple[Any, int, int]]] = defaultdict(list)
+    for index, item in enumerate(items):
+        db_item = ItemsDB.get(item.item_id)
+        slot_type = db_item.slots if db_item is not None else None
+        slots.append(slot_type)
+        reasons.append({})
+        if not slot_type:
+            continue
+
+        effect = grid.effect_mask(item)
+        artifact = blessed = affinity = 0
+        if slot_type != 'Accessory':
+            artifact = grid.artifact_mask(item, slot_type) & ~effect
+            blessed = grid.blessed_mask(item, slot_type) & ~effect
+            affinity = (grid.affinity_mask(item, slot_type)
+                        & ~(effect | artifact | blessed))
+        reasons[index] = {'effect': effect, 'artifact': artifact,
+                          'blessed': blessed, 'affinity': affinity}
+        kept = effect | artifact | blessed | affinity
+
+        for skill in item.skills:
+            if skill == 0:
+                continue
+            if 'Weapon' in slot_type:
+                group = 'weapon'
+            elif 'Accessory' in slot_type:
+                group = 'accessory'
+            else:
+                continue
+            groups[group, skill].append(
+                (rules.skill_rank(item), index, kept))
+        if rules.effect_count:
+            for item_effect in item.effects:
+                groups['effect', item_effect.effect_id].append(
+                    (rules.effect_rank(item, item_effect), index, kept))
+
+    sizes = {
+        'weapon': rules.weapon_skill_count if rules.keep_weapon_skills else 0,
+        'accessory': (rules.accessory_skill_count
+                      if rules.keep_accessory_skills else 0),
+        'effect': rules.effect_count,
+    }
+    # Same order as ItemFilter.finish, so that an item picked for both a skill
+    # and an effect is counted as a skill pick, and an item picked for one
+    # group counts toward the others it's in.
+    picked = [0] * len(items)
+    for (group, _), entries in sorted(
+            groups.items(), key=lambda g: (list(sizes).index(g[0][0]), g[0][1])):
+        if sizes[group] <= 0:
+            continue
+        reason = 'best' if group == 'effect' else 'skill'
+        entries = [(rank, index, kept | picked[index])
+                   for rank, index, kept in entries]
+        for index, variants in _top_up(entries, sizes[group], grid.all):
+            picked[index] |= variants
+            item_reasons = reasons[index]
+            for taken in item_reasons.values():
+                variants &= ~taken
+            item_reasons[reason] = item_reasons.get(reason, 0) | variants
+
+    totals: Counter = Counter()
+    for slot_type, item_reasons in zip(slots, reasons):
+        for reason, variants in item_reasons.items():
+            if variants:
+                totals[slot_type, reason, variants] += 1
+
+    counts: List[Counter] = [Counter() for _ in range(grid.count)]
+    for (slot_type, reason, variants), count in totals.items():
+        while variants:
+            lowest = variants & -variants
+            counts[lowest.bit_length() - 1][slot_type, reason] += count
+            variants ^= lowest
+    return SweepResult(grid.axes, counts)
+
+
+def to_csv(result: SweepResult, filename: Path) -> None:
+    with filename.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['variant'] +
+                        [f'{axis.section}: {axis.name}' for axis in result.axes] +
+                        ['slot type', 'reason', 'count'])
+        for variant, counts in enumerate(result.counts):
+            values = result.values(variant)
+            for (slot_type, reason), count in sorted(counts.items()):
+                writer.writerow([variant] + values +
+                                [slot_type, reason, count])
@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+from fakeprocess import FakeProcess
+from reader import RegionReader
+
+BASE = 0x140000000
+
+
+def make_process(**kwargs):
+    return FakeProcess({0x1000: bytes(range(256)) * 16, 0x9000: bytes(64)},
+                       base_address=BASE, **kwargs)
+
+
+def test_reads_and_writes_regions():
+    pm = make_process()
+    assert pm.read_bytes(BASE + 0x1000, 4) == b'\x00\x01\x02\x03'
+    pm.write_uint(BASE + 0x9004, 0xDEADBEEF)
+    assert pm.read_uint(BASE + 0x9004) == 0xDEADBEEF
+    assert pm.read_bytes(BASE + 0x9000, 8) == struct.pack('<II', 0, 0xDEADBEEF)
+    assert (pm.reads, pm.writes) == (3, 1)
+
+
+def test_access_outside_regions_fails():
+    pm = make_process()
+    with pytest.raises(MemoryError):
+        pm.read_bytes(BASE, 4)
+    with pytest.raises(MemoryError):
+        # Starts inside the region, but runs off the end of it.
+        pm.write_bytes(BASE + 0x9000 + 60, b'12345678', 8)
+
+
+def test_pattern_scan():
+    pm = make_process()
+    found = pm.pattern_scan_module(b'\x10\x11\x12', 'SOPFFO.exe')
+    assert found == BASE + 0x1010
+    found = pm.pattern_scan_module(b'\xfe\xff', 'SOPFFO.exe',
+                                   return_multiple=True)
+    assert found == [BASE + 0x1000 + 256 * i + 254 for i in range(16)]
+    assert pm.pattern_scan_module(b'nothing', 'SOPFFO.exe') is None
+
+
+def test_region_reader_returns_chunks_in_order():
+    pm = make_process(read_latency=0.001)
+    regions = [(BASE + 0x9000, 64), (BASE + 0x1000, 4096)]
+    with RegionReader(pm, chunk_size=1000, concurrency=4) as reader:
+        chunks = reader.read_all(regions)
+    assert [address for address, _ in chunks] == sorted(
+        address for address, _ in chunks)
+    data = b''.join(data for address, data in chunks
+                    if address < BASE + 0x9000)
+    assert data == bytes(range(256)) * 16
+    assert chunks[-1] == (BASE + 0x9000, bytes(64))
+    assert pm.reads == 6
@@ -0,0 +1,62 @@
+import pytest
+
+import patch
+from patch import LayoutError, VerificationError, patch_entries, patch_records
+
+
+def test_patch_entries_only_rewrites_changes(tmp_path):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(b'HDaaaabbbb')
+    assert patch_entries(path, b'HD', [b'aaaa', b'cccc'], 4) == 1
+    assert path.read_bytes() == b'HDaaaacccc'
+    assert patch_entries(path, b'HD', [b'aaaa', b'cccc'], 4) == 0
+
+
+def test_backup_keeps_the_original(tmp_path):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(b'HDaaaabbbb')
+    patch_entries(path, b'HD', [b'aaaa', b'cccc'], 4)
+    patch_entries(path, b'HD', [b'dddd', b'cccc'], 4)
+    assert (tmp_path / 'db.bin.bak').read_bytes() == b'HDaaaabbbb'
+    assert not (tmp_path / 'db.bin.tmp').exists()
+
+
+def test_patch_entries_layout_mismatch(tmp_path):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(b'HDaaaabbbb')
+    with pytest.raises(LayoutError):
+        patch_entries(path, b'HD', [b'aaaa'], 4)
+    with pytest.raises(LayoutError):
+        patch_entries(path, b'XX', [b'aaaa', b'bbbb'], 4)
+    assert path.read_bytes() == b'HDaaaabbbb'
+
+
+def test_failed_verification_undoes_only_that_patch(tmp_path, monkeypatch):
+    path = tmp_path / 'db.bin'
+    path.write_bytes(b'HDaaaabbbb')
+    patch_entries(path, b'HD', [b'aaaa', b'cccc'], 4)
+
+    monkeypatch.setattr(patch, 'checksum', lambda chunks: 0)
+    with pytest.raises(VerificationError):
+        patch_entries(path, b'HD', [b'dddd', b'cccc'], 4)
+    assert path.read_bytes() == b'HDaaaacccc'
+    assert (tmp_path / 'db.bin.bak').read_bytes() == b'HDaaaabbbb'
+    assert not (tmp_path / 'db.bin.tmp').exists()
+
+
+def test_patch_records_from_first_change(tmp_path):
+    path = tmp_path / 'strings.bin'
+    path.write_bytes(b'abcdefghi')
+    assert patch_records(path, [b'abc', b'XYZW', b'ghi']) == 7
+    assert path.read_bytes() == b'abcXYZWghi'
+    assert patch_records(path, [b'abc', b'XYZW', b'ghi']) == 0
+    # Dropping records truncates the file.
+    assert patch_records(path, [b'abc']) == 0
+    assert path.read_bytes() == b'abc'
+
+
+def test_patch_records_into_empty_file(tmp_path):
+    path = tmp_path / 'strings.bin'
+    path.write_bytes(b'')
+    assert patch_records(path, [b'abc', b'def']) == 6
+    assert path.read_bytes() == b'abcdef'
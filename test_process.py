@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+from fakeprocess import HelperProcess
+
+if not sys.platform.startswith('linux'):
+    pytest.skip('LinuxProcess needs /proc.', allow_module_level=True)
+
+from process import LinuxProcess, read_many, write_many
+
+REGIONS = {0x1000: bytes(range(256)) * 64, 0x20000: b'MARKER' + bytes(58)}
+
+
+@pytest.fixture(params=['vm', 'mem'])
+def process(request):
+    with HelperProcess(REGIONS) as helper:
+        try:
+            pm = LinuxProcess(helper.pid)
+        except PermissionError:
+            pytest.skip('Not allowed to read other processes here.')
+        # Force the /proc/<pid>/mem fallback for the second run.
+        pm._use_vm = pm._use_vm and request.param == 'vm'
+        yield pm
+        pm.close()
+
+
+def test_module_range(process):
+    start, end = process.module_range('SOPFFO.exe')
+    assert start == process.base_address
+    assert end - start >= 0x20000 + 64
+
+
+def test_reads(process):
+    base = process.base_address
+    assert process.read_bytes(base, 2) == b'MZ'
+    assert process.read_uint(base + 0x1004) == 0x07060504
+    # More ranges than fit in one process_vm_readv call.
+    ranges = [(base + 0x1000 + 256 * (i % 64), 3) for i in range(2000)]
+    assert read_many(process, ranges) == [b'\x00\x01\x02'] * 2000
+    with pytest.raises(MemoryError):
+        process.read_bytes(0x10, 4)
+
+
+def test_writes(process):
+    base = process.base_address
+    process.write_uint(base + 0x20008, 1234)
+    write_many(process, [(base + 0x1000 + 8 * i, b'\xee')
+                         for i in range(1500)])
+    assert process.read_uint(base + 0x20008) == 1234
+    data = process.read_bytes(base + 0x1000, 8 * 1500)
+    assert data[::8] == b'\xee' * 1500
+    assert data[1:8] == bytes(range(1, 8))
+
+
+def test_pattern_scan(process):
+    base = process.base_address
+    found = process.pattern_scan_module(b'MARKER', 'SOPFFO.exe')
+    assert found == base + 0x20000
+    found = process.pattern_scan_module(b'\xfe\xff', 'SOPFFO.exe',
+                                        return_multiple=True)
+    assert found == [base + 0x1000 + 256 * i + 254 for i in range(64)]
@@ -0,0 +1,99 @@
+import pytest
+
+from fakeprocess import FakeProcess
+from process import write_many
+from scheduler import WriteScheduler
+
+BASE = 0x140000000
+
+
+def make_process():
+    return FakeProcess({0: bytes(0x10000)}, base_address=BASE)
+
+
+def test_writes_wait_for_flush():
+    pm = make_process()
+    with WriteScheduler(pm, tick=0) as scheduler:
+        scheduler.write_uint(BASE + 8, 1)
+        scheduler.write_uint(BASE + 8, 2)
+        scheduler.write_uint(BASE + 12, 3)
+        # Reads go straight through, and don't see queued writes.
+        assert scheduler.read_uint(BASE + 8) == 0
+    assert pm.read_uint(BASE + 8) == 2
+    assert pm.read_uint(BASE + 12) == 3
+    # Only the last value for an address is written.
+    assert pm.writes == 2
+
+
+def test_slices_stay_within_budgets():
+    pm = make_process()
+    slices = []
+    scheduler = WriteScheduler(pm, tick=0, writes_per_tick=10,
+                               bytes_per_tick=64,
+                               progress=lambda done, total: slices.append(
+                                   (done, total)))
+    for i in range(25):
+        scheduler.write_uint(BASE + 4 * i, i + 1)
+    scheduler.write_bytes(BASE + 0x1000, b'\xab' * 200, 200)
+    assert scheduler.flush()
+
+    assert [pm.read_uint(BASE + 4 * i) for i in range(25)] == list(
+        range(1, 26))
+    assert pm.read_bytes(BASE + 0x1000, 200) == b'\xab' * 200
+    done = [d for d, _ in slices]
+    assert done == sorted(done) and done[-1] == slices[-1][1]
+    sizes = [b - a for a, b in zip([0] + done, done)]
+    assert max(sizes) <= 10
+
+
+def test_oversized_writes_are_split():
+    pm = make_process()
+    scheduler = WriteScheduler(pm, tick=0, bytes_per_tick=64)
+    scheduler.write_bytes(BASE, bytes(range(200)), 200)
+    # A later, shorter write to the same address keeps the rest of the
+    # earlier one.
+    scheduler.write_bytes(BASE, b'\xff\xff', 2)
+    assert max(len(value) for value in scheduler.pending.values()) <= 64
+    scheduler.flush()
+    assert pm.read_bytes(BASE, 200) == b'\xff\xff' + bytes(range(2, 200))
+
+
+def test_cancel_drops_unwritten():
+    pm = make_process()
+    scheduler = WriteScheduler(pm, tick=0, writes_per_tick=1)
+    for i in range(5):
+        scheduler.write_uint(BASE + 4 * i, 7)
+    scheduler.run_slice()
+    scheduler.cancel()
+    assert not scheduler.flush()
+    assert not scheduler.pending
+    assert pm.writes == 1
+
+
+def test_error_skips_flush():
+    pm = make_process()
+    with pytest.raises(KeyboardInterrupt):
+        with WriteScheduler(pm, tick=0) as scheduler:
+            scheduler.write_uint(BASE, 7)
+            raise KeyboardInterrupt
+    assert pm.read_uint(BASE) == 0
+
+
+class BatchingProcess(FakeProcess):
+    '''Has its own write_many, like LinuxProcess.'''
+
+    def write_many(self, writes):
+        for address, data in writes:
+            self.write_bytes(address, data, len(data))
+
+
+def test_write_many_is_queued():
+    pm = BatchingProcess({0: bytes(0x100)}, base_address=BASE)
+    scheduler = WriteScheduler(pm, tick=0)
+    write_many(scheduler, [(BASE + 4 * i, b'\x01\x02\x03\x04')
+                           for i in range(10)])
+    assert len(scheduler.pending) == 10
+    assert pm.writes == 0
+    scheduler.cancel()
+    assert not scheduler.flush()
+    assert pm.read_bytes(BASE, 40) == bytes(40)